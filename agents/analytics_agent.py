@@ -1,15 +1,35 @@
 import json
 from datetime import datetime
+from tools.feedback_analytics import (
+    ABOVE_AVERAGE, BELOW_AVERAGE, TIER_NO_DATA, TIER_SUGGESTIONS,
+    FeedbackAnalytics, average_suggestion, engagement_score, engagement_tier, load_feedback,
+)
 
 class AnalyticsAgent:
     def __init__(self,
                  feedback_data_path='data/performance_feedback.json',
-                 metadata_path='data/platform_metadata.json'):
+                 metadata_path='data/platform_metadata.json',
+                 aggregator=None, platform=None, profile_version=None, window=None):
         self.feedback_data_path = feedback_data_path
         self.metadata_path = metadata_path
-        self.feedback = self.load_feedback()
+        # With an aggregator, scores come from its live counters instead of the feedback file
+        self.aggregator = aggregator
+        self.platform = platform
+        self.profile_version = profile_version
+        self.window = window
+        self._feedback = {} if aggregator is not None else self.load_feedback()
         self.metadata = self.load_metadata()
 
+    @property
+    def feedback(self):
+        if self.aggregator is not None:
+            return self.aggregator.snapshot(self.platform, self.profile_version, self.window)
+        return self._feedback
+
+    @feedback.setter
+    def feedback(self, value):
+        self._feedback = value
+
     def load_feedback(self):
         try:
             with open(self.feedback_data_path, 'r') as f:
@@ -26,46 +46,52 @@ class AnalyticsAgent:
             print(f"⚠️ Metadata file not found: {self.metadata_path}")
             return {}
 
-    def calculate_engagement_score(self):
-        if not self.feedback:
+    def calculate_engagement_score(self, feedback=None):
+        feedback = self.feedback if feedback is None else feedback
+        if not feedback:
             return 0
 
-        matches = self.feedback.get("matches", 0)
-        swipes = self.feedback.get("swipes", 1)
-        return round((matches / swipes) * 100, 2)
+        matches = feedback.get("matches", 0)
+        swipes = feedback.get("swipes", 1) or 1
+        return engagement_score(swipes, matches)
 
-    def generate_recommendations(self):
-        if not self.feedback:
-            return ["⚠️ No feedback data to analyze."]
+    def generate_recommendations(self, feedback=None):
+        feedback = self.feedback if feedback is None else feedback
+        if not feedback:
+            return list(TIER_SUGGESTIONS[TIER_NO_DATA])
 
-        platform = self.feedback.get("platform", "unknown")
-        score = self.calculate_engagement_score()
+        platform = feedback.get("platform", "unknown")
+        score = self.calculate_engagement_score(feedback)
+        tier = engagement_tier(score, feedback.get("swipes", 0) or 0)
+        if tier == TIER_NO_DATA:
+            # Same answer the bulk report gives a group without swipes
+            return list(TIER_SUGGESTIONS[TIER_NO_DATA])
         suggestions = []
 
         avg_rate = self.metadata.get(platform, {}).get("average_engagement_rate")
         if avg_rate:
-            if score < avg_rate:
-                suggestions.append(f"📉 You're below {platform}'s average engagement rate ({avg_rate}%). Try improving your first photo or bio hook.")
-            else:
-                suggestions.append(f"📈 You're performing better than average on {platform}. Keep it up!")
+            suggestions += average_suggestion(BELOW_AVERAGE if score < avg_rate else ABOVE_AVERAGE, platform, avg_rate)
 
-        if score < 10:
-            suggestions.append("⬆️ Try using a different primary photo—smiling or candid works best.")
-            suggestions.append("📝 Consider shortening your bio or using simpler, playful language.")
-        elif score < 25:
-            suggestions.append("💡 Your profile is decent—try rotating a new photo or tweaking one line in your bio.")
-        else:
-            suggestions.append("🔥 Strong engagement! You could test alternate versions just for fun.")
+        suggestions += TIER_SUGGESTIONS[tier]
 
         return suggestions
 
+    def analyze_cohorts(self, feedback_path: str = None, by=("user", "platform", "version")):
+        """
+        Bulk analysis of a multi-row feedback file (JSONL / CSV / JSON) with the
+        same scores and suggestions as above, computed per group in NumPy.
+        """
+        table = load_feedback(feedback_path or self.feedback_data_path)
+        return FeedbackAnalytics(self.metadata_path).analyze(table, by=by)
+
     def summarize(self):
+        feedback = self.feedback
         print("\n📊 MatchMaxima Profile Feedback Summary")
         print("----------------------------------------")
-        print(f"Platform: {self.feedback.get('platform', 'unknown')}")
-        print(f"Total Swipes: {self.feedback.get('swipes', 'N/A')}")
-        print(f"Matches: {self.feedback.get('matches', 'N/A')}")
-        print(f"Engagement Score: {self.calculate_engagement_score()}%")
+        print(f"Platform: {feedback.get('platform', 'unknown')}")
+        print(f"Total Swipes: {feedback.get('swipes', 'N/A')}")
+        print(f"Matches: {feedback.get('matches', 'N/A')}")
+        print(f"Engagement Score: {self.calculate_engagement_score(feedback)}%")
         print("\n💡 Suggestions:")
-        for s in self.generate_recommendations():
+        for s in self.generate_recommendations(feedback):
             print(f"- {s}")
\ No newline at end of file
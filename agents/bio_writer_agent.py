@@ -1,19 +1,16 @@
-import json
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from tools.llm_client import get_llm_client
+from tools.user_profile import load_user_data
 from tools.tone_analysis_tool import ToneAnalysisTool
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 class BioWriterAgent:
-    def __init__(self, user_data_path='data/user_inputs.json'):
-        self.tone_tool = ToneAnalysisTool()
-        with open(user_data_path, 'r') as f:
-            self.user_data = json.load(f)
+    def __init__(self, user_data_path='data/user_inputs.json', llm=None, cache_responses=False, user_data=None):
+        self.llm = llm or get_llm_client()
+        # Creative generation is not cached unless explicitly requested
+        self.cache_responses = cache_responses
+        self.tone_tool = ToneAnalysisTool(llm=self.llm)
+        self.user_data = load_user_data(user_data_path, user_data)
 
-    def generate_bio(self) -> str:
+    def _bio_request(self) -> dict:
         name = self.user_data["name"]
         age = self.user_data["age"]
         location = self.user_data["location"]
@@ -31,13 +28,32 @@ class BioWriterAgent:
             f"It should sound real—not like it was written by AI or a copywriter. Keep it casual, clear, and friendly."
         )
 
-        response = client.chat.completions.create(
+        return dict(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a creative dating bio writer."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.8
+            temperature=0.8,
+            cache=self.cache_responses
         )
 
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+    def generate_bio(self) -> str:
+        return self.llm.complete(**self._bio_request())
+
+    async def agenerate_bio(self) -> str:
+        return await self.llm.acomplete(**self._bio_request())
+
+    def generate_bio_candidates(self, n: int) -> list:
+        """`n` independent bios from one request (n=…) instead of n round-trips."""
+        response = self.llm.chat(**self._bio_request(), n=n)
+        return [c.message.content.strip() for c in response.choices if c.message.content]
+
+    async def agenerate_bio_candidates(self, n: int) -> list:
+        response = await self.llm.achat(**self._bio_request(), n=n)
+        return [c.message.content.strip() for c in response.choices if c.message.content]
+
+    async def astream_bio(self):
+        """Yield the bio as it is generated, token by token."""
+        async for delta in self.llm.astream(**self._bio_request()):
+            yield delta
@@ -0,0 +1,125 @@
+#fused_bio_agent.py
+import json
+import os
+from pydantic import BaseModel, ValidationError
+from agents.bio_writer_agent import BioWriterAgent
+from agents.tone_style_agent import ToneStyleAgent
+from agents.platform_optimizer_agent import PlatformOptimizerAgent
+from tools.llm_client import get_llm_client
+from tools.user_profile import load_user_data
+
+
+class FusedBio(BaseModel):
+    bio: str
+    tone: str
+
+
+def fused_bio_enabled() -> bool:
+    return os.getenv("MATCHMAX_FUSED_BIO", "0") == "1"
+
+
+class FusedBioAgent:
+    """
+    Generate, tone-match and platform-fit a bio in one structured LLM call.
+    The result is checked locally (platform rules, and tone via the local classifier);
+    only the repair step that is actually needed goes back to the LLM.
+    """
+
+    def __init__(self, user_data_path='data/user_inputs.json', llm=None, user_data=None):
+        self.llm = llm or get_llm_client()
+        # The chained agents supply the fallback path and the single-step repairs
+        # Parsed once and shared by the sub-agents
+        user_data = load_user_data(user_data_path, user_data)
+        self.bio_agent = BioWriterAgent(llm=self.llm, user_data=user_data)
+        self.tone_agent = ToneStyleAgent(llm=self.llm, user_data=user_data)
+        self.platform_agent = PlatformOptimizerAgent(llm=self.llm, user_data=user_data)
+        self.tone_tool = self.tone_agent.tone_tool
+        self.user_data = self.bio_agent.user_data
+        self.preferred_tone = self.tone_agent.preferred_tone
+        self.platform = self.platform_agent.platform
+        self.max_length = self.platform_agent.max_length
+        # Steps taken by the last run: "fused", then any of "tone_repair", "platform_repair", "chained"
+        self.steps = []
+
+    def _fused_request(self) -> dict:
+        prompt = (
+            f"Write a short dating bio for {self.platform} for someone named {self.user_data['name']}, "
+            f"who's {self.user_data['age']} years old and lives in {self.user_data['location']}. "
+            f"They're into {', '.join(self.user_data['interests'])} and described as "
+            f"{', '.join(self.user_data['personality_traits'])}. Their goal is to {self.user_data['goal']}.\n"
+            f"Use a {self.preferred_tone} tone and stay strictly under {self.max_length} characters. "
+            "It should sound real—not like it was written by AI or a copywriter. "
+            "No buzzwords or overly clever stuff, and no emojis.\n"
+            'Reply with JSON only: {"bio": "...", "tone": "<one of: '
+            + ", ".join(self.tone_tool.label_set) + '>"}'
+        )
+
+        return dict(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": f"You are a creative dating bio writer who knows {self.platform}'s limits."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.8
+        )
+
+    def _user_text(self) -> str:
+        """What the user actually typed; the preserve emoji policy keeps emojis only if it has them."""
+        fields = [self.user_data.get(key, "") for key in ("name", "location", "goal")]
+        fields += list(self.user_data.get("interests", [])) + list(self.user_data.get("personality_traits", []))
+        return " ".join(str(field) for field in fields)
+
+    def _parse(self, raw: str):
+        try:
+            result = FusedBio(**json.loads(raw))
+        except (TypeError, ValueError, ValidationError) as e:
+            print(f"⚠️ Fused bio response invalid, falling back to the chained agents: {e}")
+            return None, None
+        bio = result.bio.strip().strip('"')
+        return (bio or None), result.tone.strip().lower()
+
+    def _needs_tone_repair(self, bio: str, reported_tone: str, local=(None, False)) -> bool:
+        # A confident local label wins; otherwise trust the tone the model reported for its own bio.
+        # Either way no extra round-trip is spent double-checking.
+        label, confident = local
+        detected = label if confident else reported_tone
+        if detected not in self.tone_tool.label_set:
+            return False
+        return not self.tone_agent.tone_matches(detected)
+
+    def generate(self) -> str:
+        self.steps = ["fused"]
+        bio, reported_tone = self._parse(self.llm.complete(**self._fused_request()))
+        if bio is None:
+            self.steps.append("chained")
+            bio = self.tone_agent.adjust_tone_if_needed(self.bio_agent.generate_bio())
+            return self.platform_agent.optimize_for_platform(bio)
+
+        if self._needs_tone_repair(bio, reported_tone, self.tone_tool.classify_locally(bio)):
+            self.steps.append("tone_repair")
+            bio = self.tone_agent.rewrite(bio)
+        # Checked and repaired against the user's own text, which decides the preserve emoji policy
+        original = self._user_text()
+        if self.platform_agent.rules.validate(bio, original=original):
+            # Repairs only the violated rules, re-validates and enforces locally as a last resort
+            self.steps.append("platform_repair")
+            bio = self.platform_agent.optimize_for_platform(bio, original=original)
+        return bio
+
+    async def agenerate(self) -> str:
+        self.steps = ["fused"]
+        bio, reported_tone = self._parse(await self.llm.acomplete(**self._fused_request()))
+        if bio is None:
+            self.steps.append("chained")
+            bio = await self.tone_agent.aadjust_tone(await self.bio_agent.agenerate_bio())
+            return await self.platform_agent.aoptimize(bio)
+
+        if self._needs_tone_repair(bio, reported_tone, await self.tone_tool.aclassify_locally(bio)):
+            self.steps.append("tone_repair")
+            bio = await self.tone_agent.arewrite(bio)
+        original = self._user_text()
+        if self.platform_agent.rules.validate(bio, original=original):
+            self.steps.append("platform_repair")
+            bio = await self.platform_agent.aoptimize(bio, original=original)
+        return bio
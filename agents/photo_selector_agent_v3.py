@@ -2,48 +2,69 @@
 import os
 import json
 from datetime import datetime
+from io import BytesIO
 from PIL import Image
 import torch
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from transformers import (
-    CLIPProcessor,
-    CLIPModel,
-    BlipProcessor,
-    BlipForConditionalGeneration,
-)
-from tools.image_optim_tool import optimize_image
+from tools.image_optim_tool import fast_decode_enabled
+from tools.image_artifacts import build_artifacts, artifacts_fingerprint_parts
+from tools.inference_backend import selected_backend
+from tools.model_registry import get_model_registry, default_device, CLIP_MODEL_NAME, BLIP_MODEL_NAME
+from tools.photo_cache import get_photo_cache, photo_cache_enabled, cache_fingerprint, hash_image_bytes
+from tools.caption_service import get_caption_service
+from tools.inference_executor import get_inference_executor
+from tools.photo_scoring import get_scoring_engine
 from tools.storage_helper import get_version_folder
-import openai
+from tools.llm_client import get_llm_client
+from pydantic import BaseModel, ValidationError
+
+# Bump whenever the enrichment / tip prompts change so cached results are invalidated
+PROMPT_VERSION = "v3.1"
+
+
+class PhotoEnrichment(BaseModel):
+    id: int
+    caption: str
+    tips: list[str]
 
 
 class PhotoSelectorAgent:
-    def __init__(self, image_dir="data/images"):
+    def __init__(self, image_dir="data/images", llm=None, images=None):
         self.image_dir = image_dir
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-
-        # CLIP for scoring
-        self.clip_model = CLIPModel.from_pretrained(
-            "openai/clip-vit-base-patch32", torch_dtype=torch.float32
-        ).to(self.device)
-        self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-
-        # BLIP-Large for detailed captions
-        self.caption_model = BlipForConditionalGeneration.from_pretrained(
-            "Salesforce/blip-image-captioning-large"
-        ).to(self.device)
-        self.caption_processor = BlipProcessor.from_pretrained(
-            "Salesforce/blip-image-captioning-large"
-        )
-
+        # Per-request uploads held in memory as {filename: bytes}; when given, image_dir is never read
+        self.images = dict(images) if images is not None else None
+        self.llm = llm or get_llm_client()
+        self.device = default_device()
+        registry = get_model_registry()
+
+        # CLIP for scoring (shared, loaded once per process)
+        self.clip_model, self.clip_processor = registry.get_clip(device=self.device)
+
+        # BLIP-Large for detailed captions (shared, loaded once per process)
+        self.caption_model, self.caption_processor = registry.get_blip(device=self.device)
+        # Batches BLIP generate calls across all in-flight requests
+        self.captioner = get_caption_service()
+
+        # One CLIP pass → weighted category score, top reasons and contrastive score
+        self.engine = get_scoring_engine(self.clip_model, self.clip_processor, self.device)
         # Negative prompts for contrastive scoring
-        self.negatives = [
-            "a blurry image",
-            "a group photo",
-            "a low-quality selfie",
-            "a messy background",
-            "a poorly lit photo",
-        ]
+        self.negatives = self.engine.negatives
+        self.cascade = os.getenv("MATCHMAX_PHOTO_CASCADE", "1") != "0"
+        # One structured LLM call for all captions + tips instead of two calls per photo
+        self.batch_enrichment = os.getenv("MATCHMAX_BATCH_ENRICHMENT", "1") != "0"
+
+        # Per-request decoded uploads: model input, thumbnail and previews from one decode
+        self.artifacts = {}
+
+        # Content-addressed cache of captions / embeddings / scores / tips
+        self.cache = None
+        if photo_cache_enabled():
+            self.cache = get_photo_cache(
+                cache_fingerprint(
+                    CLIP_MODEL_NAME, BLIP_MODEL_NAME, PROMPT_VERSION, self.engine.fingerprint_parts(),
+                    fast_decode_enabled(), selected_backend(), artifacts_fingerprint_parts(),
+                )
+            )
 
     # ---------- Public API -------------------------------------------------- #
 
@@ -84,29 +105,31 @@ class PhotoSelectorAgent:
 
     #     return results
 
-    async def select_best_images(self, max_images: int = 6):
-        if not os.path.exists(self.image_dir):
-            print(f"⚠️  Image directory '{self.image_dir}' not found.")
-            return []
-
-        image_files = [
-            f
-            for f in os.listdir(self.image_dir)
-            if f.lower().endswith((".jpg", ".jpeg", ".png"))
-        ][:max_images]
-
+    async def select_best_images(self, max_images: int = 6, cascade: bool = None):
+        """
+        Rank the uploaded photos. In cascade mode (default) every image is first
+        scored with CLIP alone in batches; only the top `max_images` finalists get
+        BLIP captioning, LLM enrichment and tips.
+        """
+        image_files, preloaded, embeddings = await self._select_finalists(max_images, cascade)
         if not image_files:
-            print("⚠️  No image files found.")
             return []
+        executor = get_inference_executor()
+
+        # Stage two: captioning, enrichment and tips for the finalists only
+        results = await asyncio.gather(
+            *(self._process_single_image(f, preloaded.get(f)) for f in image_files)
+        )
+        results = [r for r in results if r]
 
-        loop = asyncio.get_running_loop()
-        executor = ThreadPoolExecutor()
+        pending = [r for r in results if r.get("_pending_enrichment")]
+        if pending:
+            await asyncio.to_thread(self._enrich_batch, pending)
 
-        async def run_async(f):
-            return await loop.run_in_executor(executor, self._process_single_image, f)
+        # Final ranking: one scoring-engine pass over every result of the request
+        if results:
+            await executor.run(self._score_results, results, embeddings)
 
-        results = await asyncio.gather(*(run_async(f) for f in image_files))
-        results = [r for r in results if r]
         results.sort(key=lambda r: r["score"], reverse=True)
 
         print("\n✅ Top Selected Images:")
@@ -118,6 +141,83 @@ class PhotoSelectorAgent:
 
         return results
 
+    async def stream_best_images(self, max_images: int = 6, cascade: bool = None):
+        """
+        Streaming variant of `select_best_images`: each finalist is captioned,
+        enriched and scored on its own and yielded as soon as it is done, as
+        (result, ranking) where ranking is the filename order of all photos
+        finished so far. Scores match the batched path; only the enrichment is
+        one JSON-mode call per photo instead of one per request.
+        """
+        image_files, preloaded, embeddings = await self._select_finalists(max_images, cascade)
+        executor = get_inference_executor()
+
+        async def finish(fname):
+            r = await self._process_single_image(fname, preloaded.get(fname))
+            if r is None:
+                return None
+            if r.get("_pending_enrichment"):
+                await asyncio.to_thread(self._enrich_batch, [r])
+            await executor.run(self._score_results, [r], embeddings)
+            return r
+
+        tasks = [asyncio.ensure_future(finish(f)) for f in image_files]
+        done = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                r = await next_done
+                if r is None:
+                    continue
+                done.append(r)
+                done.sort(key=lambda d: d["score"], reverse=True)
+                yield r, [d["filename"] for d in done]
+        finally:
+            # Client went away mid-stream: don't keep captioning photos nobody will see
+            for task in tasks:
+                task.cancel()
+
+    async def _select_finalists(self, max_images: int, cascade: bool = None):
+        """
+        Files to fully process, plus any images / CLIP embeddings already
+        computed for them by the cascade prefilter.
+        """
+        if self.images is not None:
+            names = list(self.images)
+        elif os.path.exists(self.image_dir):
+            names = os.listdir(self.image_dir)
+        else:
+            print(f"⚠️  Image directory '{self.image_dir}' not found.")
+            return [], {}, {}
+
+        image_files = sorted(
+            f
+            for f in names
+            if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+
+        if not image_files:
+            print("⚠️  No image files found.")
+            return [], {}, {}
+
+        executor = get_inference_executor()
+        cascade = self.cascade if cascade is None else cascade
+        preloaded, embeddings = {}, {}
+
+        if cascade and len(image_files) > max_images:
+            # Stage one: decode + CLIP-only category score for every upload
+            decoded = await asyncio.gather(*(executor.run(self._load_image, f) for f in image_files))
+            loaded = [(f, img) for f, img in zip(image_files, decoded) if img is not None]
+            embeds, prefilter = await executor.run(self._prefilter_batch, [img for _, img in loaded])
+            finalists = sorted(range(len(loaded)), key=lambda i: prefilter[i], reverse=True)[:max_images]
+            print(f"🔎 Prefiltered {len(loaded)} photos → {len(finalists)} finalists")
+            preloaded = {loaded[i][0]: loaded[i][1] for i in finalists}
+            embeddings = {loaded[i][0]: embeds[i] for i in finalists}
+            image_files = list(preloaded)
+        else:
+            image_files = image_files[:max_images]
+
+        return image_files, preloaded, embeddings
+
     def save_selected_images(self, selected):
         version_dir = get_version_folder()
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -137,44 +237,140 @@ class PhotoSelectorAgent:
         os.makedirs(thumbs, exist_ok=True)
         for img in selected:
             try:
-                src = os.path.join(self.image_dir, img["filename"])
                 dst = os.path.join(thumbs, f"thumb_{img['filename']}")
-                thumb = optimize_image(src)
-                thumb.thumbnail((300, 300))
-                thumb.save(dst)
+                self.get_artifacts(img["filename"]).save_thumbnail(dst)
             except Exception as e:
                 print(f"⚠️  Thumbnail failure for {img['filename']}: {e}")
 
+    def get_artifacts(self, fname: str):
+        """Decoded artifacts for an upload; decodes on first use and keeps them for the request."""
+        if fname not in self.artifacts:
+            self.artifacts[fname] = build_artifacts(self._image_source(fname), fname)
+        return self.artifacts[fname]
+
+    def release_artifacts(self):
+        self.artifacts.clear()
+
     # ---------- Internal helpers ------------------------------------------- #
 
-    def _process_single_image(self, fname: str):
+    def _image_source(self, fname: str):
+        if self.images is not None:
+            return BytesIO(self.images[fname])
+        return os.path.join(self.image_dir, fname)
+
+    def _image_bytes(self, fname: str) -> bytes:
+        if self.images is not None:
+            return self.images[fname]
+        with open(os.path.join(self.image_dir, fname), "rb") as f:
+            return f.read()
+
+    def _load_image(self, fname: str):
         try:
-            path = os.path.join(self.image_dir, fname)
-            image = optimize_image(path)
+            return self.get_artifacts(fname).model_image
+        except Exception as e:
+            print(f"❌ Error processing {fname}: {e}")
+            return None
 
-            caption = self._generate_caption(image)
-            score = self._clip_score(image, caption)
-            # tips = self._generate_tips(caption)
-            tips = self._enrich_tip_llm(caption)
-
-            return {
-                "filename": fname,
-                "score": score,
-                "caption": caption,
-                "tips": tips,
-            }
+    async def _process_single_image(self, fname: str, image: Image.Image = None):
+        executor = get_inference_executor()
+        try:
+            result = await executor.run(self._prepare_image, fname, image)
+            if "image" not in result:
+                return result  # served from the cache
+
+            # Awaited on the event loop: no inference worker sits idle while the caption batch fills
+            blip_caption = (await asyncio.wrap_future(self.captioner.submit(result["image"]))).capitalize()
+            result["caption"] = blip_caption
+            result["_cache"]["blip_caption"] = blip_caption
+
+            if self.batch_enrichment:
+                # caption + tips come from one request-wide LLM call in select_best_images
+                result["_pending_enrichment"] = True
+            else:
+                # Network-bound: kept off the inference pool so LLM latency never starves CPU work
+                await asyncio.to_thread(self._enrich_single, result)
+
+            # score is filled in by the batched scoring pass in select_best_images
+            return result
         except Exception as e:
             print(f"❌ Error processing {fname}: {e}")
             return None
 
+    def _prepare_image(self, fname: str, image: Image.Image = None) -> dict:
+        """Cache lookup, then decode on a miss. CPU work only; runs on the inference executor."""
+        image_hash = None
+        if self.cache is not None:
+            image_hash = hash_image_bytes(self._image_bytes(fname))
+            cached = self.cache.get(image_hash)
+            if cached is not None and cached["embedding"] is not None:
+                # Cached embedding is rescored with the engine — no decode, caption or LLM call
+                return {
+                    "filename": fname,
+                    "score": cached["score"],
+                    "caption": cached["caption"],
+                    "tips": cached["tips"],
+                    "_embedding": torch.tensor(cached["embedding"]),
+                }
+
+        if image is None:
+            image = self.get_artifacts(fname).model_image
+        return {
+            "filename": fname,
+            "score": None,
+            "caption": None,
+            "tips": [],
+            "image": image,
+            "_cache": {"hash": image_hash},
+        }
+
+    def _enrich_single(self, result: dict):
+        """
+        Per-photo caption + tips. A failed call keeps the BLIP caption / no tips,
+        and marks the result degraded so it is never cached.
+        """
+        try:
+            result["caption"] = self._request_caption_llm(result["caption"])
+        except Exception as e:
+            print(f"⚠️  LLM enrichment failed: {e}")
+            result["_cache"]["degraded"] = True
+        try:
+            # tips = self._generate_tips(caption)
+            result["tips"] = self._request_tips_llm(result["caption"])
+        except Exception as e:
+            print(f"⚠️  LLM tip enrichment failed: {e}")
+            result["tips"] = []
+            result["_cache"]["degraded"] = True
+
+    def _cache_result(self, result: dict, embedding):
+        meta = result.get("_cache") or {}
+        if self.cache is None or not meta.get("hash"):
+            return
+        if meta.get("degraded"):
+            # Fallback output from an LLM outage must not outlive it; the next request retries
+            return
+        try:
+            self.cache.put(
+                meta["hash"],
+                blip_caption=meta["blip_caption"],
+                caption=result["caption"],
+                embedding=embedding,
+                score=result["score"],
+                tips=result["tips"],
+            )
+        except Exception as e:
+            print(f"⚠️  Photo cache write failed for {result['filename']}: {e}")
+
     # -- caption ------------------------------------------------------------ #
 
     def _enrich_caption_llm(self, caption: str) -> str:
         """Send BLIP caption to OpenAI GPT-3.5/GPT-4 for dating-profile enrichment using the new v1 API."""
-        import openai
+        try:
+            return self._request_caption_llm(caption)
+        except Exception as e:
+            print(f"⚠️  LLM enrichment failed: {e}")
+            return caption  # fallback to BLIP caption
 
-        # Make sure you have set your key in the env: OPENAI_API_KEY
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def _request_caption_llm(self, caption: str) -> str:
         prompt = (
             "You are an expert dating profile assistant. "
             "Given a plain, brief image description, rewrite it into a detailed, human-like sentence for a dating app. "
@@ -182,54 +378,121 @@ class PhotoSelectorAgent:
             f"Description: \"{caption}\"\n"
             "Rich Caption:"
         )
+        response = self.llm.chat(
+            model="gpt-4.1",  # or "gpt-4o" if you have access
+            messages=[
+                {"role": "system", "content": "You are an expert dating profile assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=60,
+            temperature=0.8,
+        )
+        rich_caption = response.choices[0].message.content.strip().replace('"', "")
+        return rich_caption
+
+    def _enrich_batch(self, pending: list):
+        """
+        Enrich every BLIP caption of the request in one structured-output call.
+        Entries missing or invalid in the response fall back to the per-image calls.
+        """
+        enriched = self._enrich_batch_llm([r["_cache"]["blip_caption"] for r in pending])
+
+        for i, r in enumerate(pending):
+            entry = enriched.get(i)
+            if entry is not None:
+                r["caption"] = entry.caption.strip().replace('"', "")
+                r["tips"] = self._clean_tips(entry.tips)
+            else:
+                self._enrich_single(r)
+            r.pop("_pending_enrichment", None)
+
+    def _enrich_batch_llm(self, captions: list) -> dict:
+        """Returns {index: PhotoEnrichment} for every entry that passed schema validation."""
+        listing = "\n".join(f'{i}. "{c}"' for i, c in enumerate(captions))
+        prompt = (
+            "You are an expert dating profile assistant. For each plain photo description below:\n"
+            "1) rewrite it into a detailed, human-like sentence for a dating app, mentioning the person’s "
+            "outfit, expression, vibe, and setting if possible;\n"
+            "2) give 3 short, actionable tips to improve the photo for a dating profile, focused on pose, "
+            "facial expression, outfit, and background — each 1 friendly sentence in the second person.\n"
+            'Reply with JSON only: {"photos": [{"id": <number>, "caption": "...", "tips": ["...", "...", "..."]}]}\n\n'
+            f"Descriptions:\n{listing}"
+        )
         try:
-            response = client.chat.completions.create(
-                model="gpt-4.1",  # or "gpt-4o" if you have access
+            response = self.llm.chat(
+                model="gpt-4.1",
                 messages=[
                     {"role": "system", "content": "You are an expert dating profile assistant."},
                     {"role": "user", "content": prompt},
                 ],
-                max_tokens=60,
+                response_format={"type": "json_object"},
+                max_tokens=160 * len(captions),
                 temperature=0.8,
             )
-            rich_caption = response.choices[0].message.content.strip().replace('"', "")
-            return rich_caption
+            payload = json.loads(response.choices[0].message.content)
         except Exception as e:
-            print(f"⚠️  LLM enrichment failed: {e}")
-            return caption  # fallback to BLIP caption
+            print(f"⚠️  Batched LLM enrichment failed, falling back per photo: {e}")
+            return {}
+
+        enriched = {}
+        for item in payload.get("photos", []) if isinstance(payload, dict) else []:
+            try:
+                entry = PhotoEnrichment(**item)
+            except (TypeError, ValidationError):
+                continue
+            if 0 <= entry.id < len(captions) and entry.caption.strip():
+                enriched[entry.id] = entry
+        missing = len(captions) - len(enriched)
+        if missing:
+            print(f"⚠️  Batched enrichment missing {missing} photo(s); falling back per photo")
+        return enriched
 
     def _generate_caption(self, image: Image.Image) -> str:
         """Generate a zero-shot BLIP caption, then enrich with LLM for dating profiles."""
-        inputs = self.caption_processor(images=image, text="", return_tensors="pt").to(self.device)
-        out_ids = self.caption_model.generate(
-            **inputs,
-            max_new_tokens=80,
-            num_beams=5,
-            length_penalty=1.2,
-            early_stopping=True,
-        )
-        blip_caption = self.caption_processor.decode(out_ids[0], skip_special_tokens=True).strip().capitalize()
+        blip_caption = self._blip_caption(image)
         # Use LLM enrichment for all captions, or set a threshold for short/generic ones
         rich_caption = self._enrich_caption_llm(blip_caption)
         return rich_caption
 
-    # -- scoring ------------------------------------------------------------ #
+    def _blip_caption(self, image: Image.Image) -> str:
+        return self.captioner.caption(image).capitalize()
 
-    def _clip_score(self, image: Image.Image, caption: str) -> float:
-        texts = [caption] + self.negatives
-        inputs = self.clip_processor(
-            text=texts, images=[image], return_tensors="pt", padding=True
-        ).to(self.device)
+    # -- scoring ------------------------------------------------------------ #
 
-        with torch.no_grad():
-            logits = self.clip_model(**inputs).logits_per_image
-            probs = logits.softmax(dim=1)[0]
-        return round(probs[0].item() * 100, 1)
+    def _score_results(self, results, embeddings):
+        """
+        Rank all results of a request in one vectorized pass. Embeddings come from
+        the cascade prefilter or the cache where available; the rest are encoded as one batch.
+        """
+        missing = [
+            r for r in results
+            if r.get("_embedding") is None and r["filename"] not in embeddings
+        ]
+        if missing:
+            for r, embed in zip(missing, self.engine.embed([r["image"] for r in missing])):
+                embeddings[r["filename"]] = embed
+
+        embeds = torch.stack([
+            r["_embedding"] if r.get("_embedding") is not None else embeddings[r["filename"]]
+            for r in results
+        ]).float()
+        scored = self.engine.score(embeds, [r["caption"] for r in results])
+
+        for r, result, embed in zip(results, scored, embeds):
+            r.update(result)
+            if "image" in r:
+                self._cache_result(r, embed.cpu().tolist())
+            for key in ("image", "_cache", "_embedding"):
+                r.pop(key, None)
+
+    def _prefilter_batch(self, images):
+        """CLIP-only stage: embeddings plus the weighted category score per image."""
+        embeds = self.engine.embed(images)
+        return embeds, [r["score"] for r in self.engine.score(embeds)]
 
     # -- tips --------------------------------------------------------------- #
 
-    def _enrich_tip_llm(self, caption: str) -> list:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def _request_tips_llm(self, caption: str) -> list:
         prompt = (
             "You are an expert in online dating profiles. "
             "Based on this detailed photo description, generate 3 short, actionable tips to improve the photo for a dating profile. "
@@ -237,29 +500,29 @@ class PhotoSelectorAgent:
             f"\nPhoto Description: \"{caption}\""
             "\nTips:"
         )
-        try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Or gpt-4o if available
-                messages=[
-                    {"role": "system", "content": "You are a dating profile expert."},
-                    {"role": "user", "content": prompt},
-                ],
-                max_tokens=100,
-                temperature=0.8,
-            )
-            raw = response.choices[0].message.content.strip()
-            # Split into tips (handles both numbered and bulleted formats)
-            tips = [
-                tip.lstrip("•-1234567890. ").strip()
-                for tip in raw.split("\n")
-                if tip.strip()
-            ]
-            # Only keep lines that look like real tips (not headers)
-            tips = [t for t in tips if len(t.split()) > 3]
-            return tips[:3]
-        except Exception as e:
-            print(f"⚠️  LLM tip enrichment failed: {e}")
-            return []
+        response = self.llm.chat(
+            model="gpt-3.5-turbo",  # Or gpt-4o if available
+            messages=[
+                {"role": "system", "content": "You are a dating profile expert."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=100,
+            temperature=0.8,
+        )
+        raw = response.choices[0].message.content.strip()
+        return self._clean_tips(raw.split("\n"))
+
+    @staticmethod
+    def _clean_tips(lines) -> list:
+        # Strip bullets / numbering (handles both numbered and bulleted formats)
+        tips = [
+            tip.lstrip("•-1234567890. ").strip()
+            for tip in lines
+            if tip.strip()
+        ]
+        # Only keep lines that look like real tips (not headers)
+        tips = [t for t in tips if len(t.split()) > 3]
+        return tips[:3]
 
     def _generate_tips(self, caption: str):
         """Return a list of detailed, context-aware tips."""
@@ -1,34 +1,83 @@
 #platform_optimizer_agent.py
-import json
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from tools.llm_client import get_llm_client
+from tools.user_profile import load_user_data
+from tools.platform_rules import get_platform_rules
 
 class PlatformOptimizerAgent:
-    def __init__(self, user_data_path='data/user_inputs.json', rules_path='config/platform_rules.yaml'):
-        with open(user_data_path, 'r') as f:
-            self.user_data = json.load(f)
+    def __init__(self, user_data_path='data/user_inputs.json', rules_path='config/platform_rules.yaml', llm=None,
+                 cache_responses=False, metadata_path='data/platform_metadata.json', user_data=None):
+        self.llm = llm or get_llm_client()
+        # Same bio + platform + limit often repeats; opt in to reuse the previous answer
+        self.cache_responses = cache_responses
+        self.user_data = load_user_data(user_data_path, user_data)
         self.platform = self.user_data.get("platform", "Tinder")
-        self.max_length = self.user_data.get("max_bio_length", 500)
 
-    def optimize_for_platform(self, bio: str) -> str:
+        # Compiled once per process; the user's max_bio_length can only tighten the platform limit
+        self.rules = get_platform_rules(rules_path, metadata_path).for_platform(
+            self.platform, self.user_data.get("max_bio_length")
+        )
+        self.max_length = self.rules.max_length
+        self.max_repairs = int(os.getenv("MATCHMAX_PLATFORM_MAX_REPAIRS", "2"))
+
+    def _optimize_request(self, bio: str, violations=None) -> dict:
+        emoji_rule = (
+            "Emojis are fine." if self.rules.emoji == "allow"
+            else "No emojis." if self.rules.emoji == "none"
+            else "No emojis unless already present."
+        )
         prompt = (
             f"You're helping someone get better matches on {self.platform}. Take this dating bio and make sure it fits within {self.max_length} characters. "
             "Keep it friendly, relaxed, and like something a real person would write—not too polished. "
-            "Only make small edits if needed. Avoid buzzwords or overly clever stuff. No emojis unless already present.\n\n"
-            f"Bio:\n\"{bio}\""
+            f"Only make small edits if needed. Avoid buzzwords or overly clever stuff. {emoji_rule}\n\n"
         )
+        if violations:
+            prompt += "Fix these problems:\n" + "\n".join(f"- The bio {v}" for v in violations) + "\n\n"
+        prompt += f"Bio:\n\"{bio}\""
 
-        response = client.chat.completions.create(
+        return dict(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": f"You are optimizing bios for {self.platform}'s algorithm and character limits."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.6
+            temperature=0.6,
+            cache=self.cache_responses
         )
 
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+    def _check(self, bio: str, original: str) -> list:
+        violations = self.rules.validate(bio, original=original)
+        if violations:
+            print(f"📏 {self.platform} rule violations: {'; '.join(violations)}")
+        return violations
+
+    def _finalize(self, bio: str, original: str) -> str:
+        print(f"⚠️ Still violating {self.platform} rules after {self.max_repairs} repair(s); enforcing locally.")
+        return self.rules.enforce(bio, original=original)
+
+    def optimize_for_platform(self, bio: str, original: str = None) -> str:
+        # The preserve emoji policy compares against the text the user supplied (default: this bio)
+        original = bio if original is None else original
+        violations = self._check(bio, original)
+        if not violations:
+            print(f"✅ Bio already meets {self.platform}'s rules. Skipping the optimizer call.")
+            return bio
+        for _ in range(self.max_repairs):
+            bio = self.llm.complete(**self._optimize_request(bio, violations)).strip('"')
+            violations = self._check(bio, original)
+            if not violations:
+                return bio
+        return self._finalize(bio, original)
+
+    async def aoptimize(self, bio: str, original: str = None) -> str:
+        original = bio if original is None else original
+        violations = self._check(bio, original)
+        if not violations:
+            print(f"✅ Bio already meets {self.platform}'s rules. Skipping the optimizer call.")
+            return bio
+        for _ in range(self.max_repairs):
+            bio = (await self.llm.acomplete(**self._optimize_request(bio, violations))).strip('"')
+            violations = self._check(bio, original)
+            if not violations:
+                return bio
+        return self._finalize(bio, original)
@@ -1,31 +1,29 @@
 #tone_style_agent.py
-import json
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+from tools.llm_client import get_llm_client
+from tools.user_profile import load_user_data
 from tools.tone_analysis_tool import ToneAnalysisTool
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 class ToneStyleAgent:
-    def __init__(self, user_data_path='data/user_inputs.json'):
-        self.tone_tool = ToneAnalysisTool()
-        with open(user_data_path, 'r') as f:
-            self.user_data = json.load(f)
+    def __init__(self, user_data_path='data/user_inputs.json', llm=None, cache_responses=False, user_data=None):
+        self.llm = llm or get_llm_client()
+        # Creative rewrites are not cached unless explicitly requested
+        self.cache_responses = cache_responses
+        self.tone_tool = ToneAnalysisTool(llm=self.llm)
+        self.user_data = load_user_data(user_data_path, user_data)
         self.preferred_tone = self.user_data.get("preferred_tone", "casual")
 
-    def adjust_tone_if_needed(self, bio: str) -> str:
-        detected_tone = self.tone_tool.analyze_tone(bio)
+    def tone_matches(self, detected_tone: str) -> bool:
         print(f"🧠 Detected tone: {detected_tone}")
         print(f"🎯 Preferred tone: {self.preferred_tone}")
 
         if detected_tone == self.preferred_tone:
             print("✅ Bio tone matches preference. No changes needed.")
-            return bio
+            return True
 
         print("⚠️ Tone mismatch. Adjusting tone...")
+        return False
 
+    def _rewrite_request(self, bio: str) -> dict:
         prompt = (
             f"You are rewriting a short dating profile bio to match a {self.preferred_tone} tone. "
             "Write like a real person—not a professional writer. Avoid fancy words, overthinking, or trying too hard. "
@@ -33,13 +31,29 @@ class ToneStyleAgent:
             f"Here’s the original bio:\n\n\"{bio}\"\n\nRewrite it to sound more human, keeping the meaning intact."
         )
 
-        response = client.chat.completions.create(
+        return dict(
             model="gpt-4.1",
             messages=[
                 {"role": "system", "content": "You're just a regular person helping a friend improve their dating bio."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.75
+            temperature=0.75,
+            cache=self.cache_responses
         )
 
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+    def rewrite(self, bio: str) -> str:
+        """Rewrite `bio` in the preferred tone (one LLM call, no tone check)."""
+        return self.llm.complete(**self._rewrite_request(bio))
+
+    async def arewrite(self, bio: str) -> str:
+        return await self.llm.acomplete(**self._rewrite_request(bio))
+
+    def adjust_tone_if_needed(self, bio: str) -> str:
+        if self.tone_matches(self.tone_tool.analyze_tone(bio)):
+            return bio
+        return self.rewrite(bio)
+
+    async def aadjust_tone(self, bio: str) -> str:
+        if self.tone_matches(await self.tone_tool.aanalyze_tone(bio)):
+            return bio
+        return await self.arewrite(bio)
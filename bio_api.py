@@ -2,36 +2,55 @@
 from fastapi import FastAPI, HTTPException, Form, UploadFile, File
 from pydantic import BaseModel
 from agents.bio_writer_agent import BioWriterAgent
+from tools.model_registry import get_model_registry, preload_enabled
+from tools.caption_service import caption_service_stats, shutdown_caption_service
+from tools.photo_cache import photo_cache_stats
+from tools.inference_executor import get_inference_executor, inference_executor_stats, shutdown_inference_executor
+from tools.llm_client import llm_client_stats, aclose_llm_client
+from tools.tone_classifier import tone_classifier_stats
+from tools.user_profile import UserInput
+from tools.feedback_stream import get_feedback_aggregator, save_feedback_checkpoint
 import uvicorn
-import tempfile
 import json
 import os
 
 app = FastAPI()
 
-class UserInput(BaseModel):
-    name: str
-    age: int
-    location: str
-    interests: list[str]
-    personality_traits: list[str]
-    goal: str
-    preferred_tone: str = "casual"
+@app.on_event("startup")
+def load_vision_models():
+    # Set the torch thread budget before any model work starts
+    get_inference_executor()
+    # Load CLIP + BLIP once so photo requests reuse them instead of reloading per call
+    if preload_enabled():
+        get_model_registry().preload()
+
+@app.on_event("shutdown")
+async def stop_inference_workers():
+    shutdown_caption_service()
+    shutdown_inference_executor()
+    await aclose_llm_client()
+    save_feedback_checkpoint()
+
+@app.get("/model-stats")
+def model_stats():
+    stats = get_model_registry().stats()
+    stats["captioning"] = caption_service_stats()
+    stats["photo_cache"] = photo_cache_stats()
+    stats["inference_executor"] = inference_executor_stats()
+    return stats
+
+@app.get("/llm-stats")
+def llm_stats():
+    stats = llm_client_stats()
+    stats["tone_classifier"] = tone_classifier_stats()
+    return stats
 
 @app.post("/generate-bio")
-def generate_bio(input_data: UserInput):
+async def generate_bio(input_data: UserInput):
     try:
-        # Save temp user input to mimic local JSON loading
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".json") as tmp_file:
-            json.dump(input_data.dict(), tmp_file)
-            tmp_file_path = tmp_file.name
-
-        # Instantiate agent with the temp file
-        agent = BioWriterAgent(user_data_path=tmp_file_path)
-        generated_bio = agent.generate_bio()
-
-        # Clean up temp file
-        os.remove(tmp_file_path)
+        # The validated request body is the profile; no filesystem round-trip
+        agent = BioWriterAgent(user_data=input_data)
+        generated_bio = await agent.agenerate_bio()
 
         return {"generated_bio": generated_bio}
     
@@ -45,22 +64,11 @@ class ToneAdjustInput(BaseModel):
     preferred_tone: str
 
 @app.post("/adjust-tone")
-def adjust_tone(input_data: ToneAdjustInput):
+async def adjust_tone(input_data: ToneAdjustInput):
     try:
-        # Prepare a minimal temp user data file
-        temp_data = {
-            "preferred_tone": input_data.preferred_tone
-        }
-
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".json") as tmp_file:
-            json.dump(temp_data, tmp_file)
-            tmp_file_path = tmp_file.name
-
         # Use the tone agent with dynamic tone input
-        tone_agent = ToneStyleAgent(user_data_path=tmp_file_path)
-        adjusted_bio = tone_agent.adjust_tone_if_needed(input_data.bio)
-
-        os.remove(tmp_file_path)
+        tone_agent = ToneStyleAgent(user_data={"preferred_tone": input_data.preferred_tone})
+        adjusted_bio = await tone_agent.aadjust_tone(input_data.bio)
 
         return {
             "adjusted_bio": adjusted_bio
@@ -77,49 +85,45 @@ class PlatformOptimizeInput(BaseModel):
     max_bio_length: int = 500
 
 @app.post("/optimize-platform")
-def optimize_bio(input_data: PlatformOptimizeInput):
+async def optimize_bio(input_data: PlatformOptimizeInput):
     try:
-        # Create temp user data with platform info
-        temp_data = {
+        # Run optimization with the platform info from the request
+        optimizer = PlatformOptimizerAgent(user_data={
             "platform": input_data.platform,
             "max_bio_length": input_data.max_bio_length
-        }
-
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".json") as tmp_file:
-            json.dump(temp_data, tmp_file)
-            tmp_file_path = tmp_file.name
-
-        # Run optimization
-        optimizer = PlatformOptimizerAgent(user_data_path=tmp_file_path)
-        optimized_bio = optimizer.optimize_for_platform(input_data.bio)
-
-        os.remove(tmp_file_path)
+        })
+        optimized_bio = await optimizer.aoptimize(input_data.bio)
 
         return {"optimized_bio": optimized_bio}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-from typing import List
-import shutil
+from typing import List, Optional
 from agents.photo_selector_agent_v3 import PhotoSelectorAgent
 
+async def _read_uploads(files: List[UploadFile]) -> dict:
+    """
+    Upload bytes keyed by filename, kept in memory for this request only.
+    Nothing is written to the shared data/images directory, so concurrent
+    requests never see each other's photos. Repeated names get a suffix.
+    """
+    images = {}
+    for file in files:
+        name = os.path.basename(file.filename or "upload")
+        base, ext = os.path.splitext(name)
+        n = 1
+        while name in images:
+            name = f"{base}_{n}{ext}"
+            n += 1
+        images[name] = await file.read()
+    return images
+
 @app.post("/select-photos")
 async def select_photos(files: List[UploadFile] = File(...)):
-    upload_dir = "data/images"
-    os.makedirs(upload_dir, exist_ok=True)
-    saved_files = []
-
     try:
-        # Save uploaded files
-        for file in files:
-            file_path = os.path.join(upload_dir, file.filename)
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
-            saved_files.append(file_path)
-
-        # Run the agent
-        agent = PhotoSelectorAgent(image_dir=upload_dir)
+        # Run the agent on the in-memory uploads
+        agent = PhotoSelectorAgent(images=await _read_uploads(files))
         selected = await agent.select_best_images()
 
         return {
@@ -137,18 +141,26 @@ async def select_photos(files: List[UploadFile] = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        # 🧹 Clean up all uploaded files
-        for file_path in saved_files:
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"⚠️  Cleanup failed for {file_path}: {e}")
-
-from agents.bio_writer_agent import BioWriterAgent
-from agents.tone_style_agent import ToneStyleAgent
-from agents.platform_optimizer_agent import PlatformOptimizerAgent
 from agents.photo_selector_agent_v3 import PhotoSelectorAgent
+from agents.fused_bio_agent import fused_bio_enabled
+from workflows.batch_bio_workflow import agenerate_profile_bio
+from tools.async_helpers import run_branches, timed
+import asyncio
+import time
+
+def _profile_from_form(name, age, location, interests, personality_traits, goal,
+                       preferred_tone, platform, max_bio_length) -> UserInput:
+    return UserInput(
+        name=name,
+        age=age,
+        location=location,
+        interests=[i.strip() for i in interests.split(",")],
+        personality_traits=[t.strip() for t in personality_traits.split(",")],
+        goal=goal,
+        preferred_tone=preferred_tone,
+        platform=platform,
+        max_bio_length=max_bio_length
+    )
 
 @app.post("/generate-complete-profile")
 async def generate_complete_profile(
@@ -161,97 +173,274 @@ async def generate_complete_profile(
     preferred_tone: str = Form("casual"),
     platform: str = Form("Tinder"),
     max_bio_length: int = Form(280),
+    fused: Optional[bool] = Form(None),  # one-call bio mode; defaults to MATCHMAX_FUSED_BIO
     files: List[UploadFile] = File(...)
 ):
     try:
-        # Step 1: Save temporary user data
-        user_data = {
-            "name": name,
-            "age": age,
-            "location": location,
-            "interests": [i.strip() for i in interests.split(",")],
-            "personality_traits": [t.strip() for t in personality_traits.split(",")],
-            "goal": goal,
-            "preferred_tone": preferred_tone,
-            "platform": platform,
-            "max_bio_length": max_bio_length
+        # Step 1: Validate the profile once; every agent shares it in memory
+        profile = _profile_from_form(
+            name, age, location, interests, personality_traits, goal, preferred_tone, platform, max_bio_length
+        )
+
+        async def bio_branch():
+            # Steps 2-4: generate → tone → platform, or one fused call that only repairs the failing check
+            return await agenerate_profile_bio(profile, fused)
+
+        async def photo_branch():
+            # Step 5: Process photos from memory (vision work runs on the inference executor)
+            photo_agent = PhotoSelectorAgent(images=await _read_uploads(files))
+            try:
+                selected_photos = await photo_agent.select_best_images()
+
+                # 👉 Step 6: Attach thumbnails before cleanup (reuses the decode done for scoring)
+                final_photos = []
+                for img in selected_photos:
+                    try:
+                        artifacts = photo_agent.get_artifacts(img["filename"])
+                        base64_thumb = await asyncio.to_thread(artifacts.preview_base64)
+                    except Exception as e:
+                        print(f"⚠️ Failed to create thumbnail for {img['filename']}: {e}")
+                        base64_thumb = ""
+                    final_photos.append({
+                        "filename": img["filename"],
+                        "score": img["score"],
+                        "caption": img["caption"],
+                        "tips": img["tips"],
+                        "thumbnail_base64": base64_thumb
+                    })
+                return final_photos
+            finally:
+                photo_agent.release_artifacts()
+
+        # The two pipelines share no data: LLM round-trips overlap the vision work.
+        # If one fails the other is cancelled rather than left running after the 500.
+        start = time.perf_counter()
+        ((final_bio, bio_steps), bio_ms), (final_photos, photos_ms) = await run_branches(
+            timed(bio_branch()), timed(photo_branch())
+        )
+        total_ms = round((time.perf_counter() - start) * 1000, 1)
+        print(f"⏱️ Profile: bio {bio_ms} ms, photos {photos_ms} ms, total {total_ms} ms")
+
+        # ✅ Step 7: Return response
+        return {
+            "final_bio": final_bio,
+            "bio_steps": bio_steps,
+            "selected_photos": final_photos,
+            "timings": {"bio_ms": bio_ms, "photos_ms": photos_ms, "total_ms": total_ms}
         }
 
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".json") as tmp_file:
-            json.dump(user_data, tmp_file)
-            tmp_file_path = tmp_file.name
-
-        # Step 2: Generate raw bio
-        bio_agent = BioWriterAgent(user_data_path=tmp_file_path)
-        raw_bio = bio_agent.generate_bio()
-
-        # Step 3: Adjust tone
-        tone_agent = ToneStyleAgent(user_data_path=tmp_file_path)
-        adjusted_bio = tone_agent.adjust_tone_if_needed(raw_bio)
-
-        # Step 4: Optimize for platform
-        platform_agent = PlatformOptimizerAgent(user_data_path=tmp_file_path)
-        final_bio = platform_agent.optimize_for_platform(adjusted_bio)
-
-        # Step 5: Process photos
-        upload_dir = "data/images"
-        os.makedirs(upload_dir, exist_ok=True)
-        saved_files = []
-
-        for file in files:
-            file_path = os.path.join(upload_dir, file.filename)
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
-            saved_files.append(file_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+from fastapi.responses import StreamingResponse
 
-        photo_agent = PhotoSelectorAgent(image_dir=upload_dir)
-        selected_photos = await photo_agent.select_best_images()
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-        import base64
-        from io import BytesIO
-        from PIL import Image
+def _ndjson(event: str, data: dict) -> str:
+    return json.dumps({"event": event, **data}) + "\n"
 
-        def generate_base64_thumbnail(image_path: str, size=(300, 300)) -> str:
+@app.post("/generate-complete-profile/stream")
+async def generate_complete_profile_stream(
+    name: str = Form(...),
+    age: int = Form(...),
+    location: str = Form(...),
+    interests: str = Form(...),  # comma-separated
+    personality_traits: str = Form(...),  # comma-separated
+    goal: str = Form(...),
+    preferred_tone: str = Form("casual"),
+    platform: str = Form("Tinder"),
+    max_bio_length: int = Form(280),
+    fused: Optional[bool] = Form(None),
+    stream_format: str = Form("sse"),  # "sse" (text/event-stream) or "ndjson"
+    files: List[UploadFile] = File(...)
+):
+    """
+    Same work as /generate-complete-profile, streamed as it happens:
+    bio_token events while the bio is written, a stage event per finished step,
+    a photo event per scored photo (with the ranking so far), then done.
+    Both branches run at once; failures arrive as error events for that branch.
+    """
+    if stream_format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="stream_format must be 'sse' or 'ndjson'")
+    encode = _sse if stream_format == "sse" else _ndjson
+
+    profile = _profile_from_form(
+        name, age, location, interests, personality_traits, goal, preferred_tone, platform, max_bio_length
+    )
+    # Read the uploads before streaming starts (they are closed once this handler returns)
+    images = await _read_uploads(files)
+
+    use_fused = fused if fused is not None else fused_bio_enabled()
+
+    async def events():
+        queue = asyncio.Queue()
+        summary = {"final_bio": None, "ranking": [], "timings": {}}
+        start = time.perf_counter()
+
+        async def emit(event, data):
+            await queue.put((event, data))
+
+        async def bio_branch():
+            summary["final_bio"], _ = await agenerate_profile_bio(profile, use_fused, on_event=emit)
+
+        async def photo_branch():
+            photo_agent = PhotoSelectorAgent(images=images)
             try:
-                img = Image.open(image_path)
-                img.thumbnail(size)
-                buffered = BytesIO()
-                img.save(buffered, format="JPEG")
-                return base64.b64encode(buffered.getvalue()).decode("utf-8")
-            except Exception as e:
-                print(f"⚠️ Failed to create thumbnail for {image_path}: {e}")
-                return ""
-
-        # 👉 Step 6: Attach thumbnails before cleanup
-        final_photos = []
-        for img in selected_photos:
-            img_path = os.path.join(upload_dir, img["filename"])
-            base64_thumb = generate_base64_thumbnail(img_path)
-            final_photos.append({
-                "filename": img["filename"],
-                "score": img["score"],
-                "caption": img["caption"],
-                "tips": img["tips"],
-                "thumbnail_base64": base64_thumb
-            })
-
-        # 🧹 Step 7: Now safely clean up
-        os.remove(tmp_file_path)
-        for file_path in saved_files:
+                async for img, ranking in photo_agent.stream_best_images():
+                    try:
+                        artifacts = photo_agent.get_artifacts(img["filename"])
+                        base64_thumb = await asyncio.to_thread(artifacts.preview_base64)
+                    except Exception as e:
+                        print(f"⚠️ Failed to create thumbnail for {img['filename']}: {e}")
+                        base64_thumb = ""
+                    await emit("photo", {
+                        "filename": img["filename"],
+                        "score": img["score"],
+                        "caption": img["caption"],
+                        "tips": img["tips"],
+                        "thumbnail_base64": base64_thumb,
+                        "rank": ranking.index(img["filename"]) + 1,
+                        "ranking": ranking
+                    })
+                    summary["ranking"] = ranking
+                await emit("stage", {"stage": "photos", "ranking": summary["ranking"]})
+            finally:
+                photo_agent.release_artifacts()
+
+        async def run(branch, label):
             try:
-                os.remove(file_path)
+                _, summary["timings"][f"{label}_ms"] = await timed(branch())
             except Exception as e:
-                print(f"⚠️  Failed to remove {file_path}: {e}")
-
-        # ✅ Step 8: Return response
-        return {
-            "final_bio": final_bio,
-            "selected_photos": final_photos
-        }
+                await emit("error", {"branch": label, "detail": str(e)})
+            finally:
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(run(bio_branch, "bio")), asyncio.create_task(run(photo_branch, "photos"))]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                event, data = item
+                data["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                yield encode(event, data)
+            summary["timings"]["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            yield encode("done", summary)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+from fastapi import Request
+from workflows.batch_bio_workflow import agenerate_bios, aparse_ndjson_chunks
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+@app.post("/generate-bios/batch")
+async def generate_bios_batch(request: Request, concurrency: Optional[int] = None, fused: Optional[bool] = None):
+    """
+    Bulk /generate-bio. The body is a JSON list of UserInput records (or {"users": [...]}),
+    or NDJSON with one record per line. Every record runs generate → tone → platform
+    with at most `concurrency` in flight (MATCHMAX_BATCH_CONCURRENCY by default);
+    invalid records and failed calls only fail their own result.
+    NDJSON in (or Accept: application/x-ndjson) streams results as they finish;
+    otherwise all results are returned in input order.
+    """
+    if concurrency is not None and concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+
+    ndjson_in = "ndjson" in request.headers.get("content-type", "")
+    if ndjson_in:
+        # Records are parsed line by line as the upload arrives, while earlier results stream back
+        records = aparse_ndjson_chunks(request.stream())
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON list of users or NDJSON")
+        records = body.get("users") if isinstance(body, dict) else body
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Expected a list of users")
+
+    if ndjson_in or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        async def lines():
+            async for result in agenerate_bios(records, concurrency, fused):
+                yield json.dumps(result) + "\n"
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    start = time.perf_counter()
+    results = sorted([r async for r in agenerate_bios(records, concurrency, fused)], key=lambda r: r["index"])
+    succeeded = sum(1 for r in results if r["ok"])
+    return {
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+from agents.analytics_agent import AnalyticsAgent
+
+@app.post("/feedback/events")
+async def ingest_feedback_events(request: Request):
+    """
+    Swipe / match events for the live aggregates: one event, a JSON list,
+    {"events": [...]}, or NDJSON. Each is {"platform", "profile_version", "ts"?}
+    plus either "event": "swipe" | "match" or "swipes" / "matches" counts.
+    Malformed NDJSON lines and invalid events are counted under "rejected".
+    """
+    errors = []
+    if "ndjson" in request.headers.get("content-type", ""):
+        events = []
+        async for event in aparse_ndjson_chunks(request.stream()):
+            if isinstance(event, Exception):
+                errors.append(f"record {len(events) + len(errors) + 1}: {event}")
+            else:
+                events.append(event)
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a feedback event, a list of events or NDJSON")
+        events = body.get("events", [body]) if isinstance(body, dict) else body
+        if not isinstance(events, list):
+            raise HTTPException(status_code=400, detail="Expected a list of events")
+
+    aggregator = get_feedback_aggregator()
+    applied = await asyncio.to_thread(aggregator.ingest_many, events)
+    # Unparseable lines never reach the aggregator; report them alongside its own rejections
+    return {
+        "received": len(events) + len(errors),
+        "applied": applied,
+        "rejected": len(events) - applied + len(errors),
+        "errors": errors[:20],
+        "total_events": aggregator.events,
+    }
+
+@app.get("/feedback/summary")
+def feedback_summary(platform: Optional[str] = None, profile_version: Optional[str] = None,
+                     window: Optional[str] = None):
+    """Engagement score and suggestions from the live aggregates (all-time, or over 1h / 24h / 7d)."""
+    agent = AnalyticsAgent(aggregator=get_feedback_aggregator(), platform=platform,
+                           profile_version=profile_version, window=window)
+    try:
+        feedback = agent.feedback
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        **feedback,
+        "engagement_score": agent.calculate_engagement_score(feedback),
+        "suggestions": agent.generate_recommendations(feedback),
+    }
+
+@app.get("/feedback-stats")
+def feedback_stats():
+    return get_feedback_aggregator().stats()
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
 if __name__ == "__main__":
     uvicorn.run("bio_api:app", host="0.0.0.0", port=8000, reload=True)
 
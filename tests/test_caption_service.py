@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from tools.caption_service import CaptionBatcher
+
+
+class GatedBatcher(CaptionBatcher):
+    """Captions are the image names; each batch waits for `gate` so callers can cancel mid-batch."""
+
+    def __init__(self, **kwargs):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.seen = []
+        super().__init__(model=None, processor=None, device="cpu", **kwargs)
+
+    def _generate(self, images):
+        self.seen.append(list(images))
+        self.started.set()
+        self.gate.wait(5)
+        return [f"caption of {image}" for image in images]
+
+
+@pytest.fixture
+def batcher():
+    batcher = GatedBatcher(max_batch_size=1, max_wait_ms=1)
+    yield batcher
+    batcher.gate.set()
+    batcher.shutdown()
+
+
+def test_cancelled_callers_do_not_kill_the_batcher(batcher):
+    first = batcher.submit("a")
+    assert batcher.started.wait(5)
+    # Queued behind the running batch, then abandoned by its caller
+    queued = batcher.submit("b")
+    assert queued.cancel()
+    # Already claimed by the running batch: too late to cancel, it still gets its result
+    assert not first.cancel()
+
+    batcher.gate.set()
+    assert first.result(timeout=5) == "caption of a"
+    assert batcher.caption("c", timeout=5) == "caption of c"
+    assert ["b"] not in batcher.seen
+    assert batcher._worker.is_alive()
+
+
+def test_cancelled_async_caller_mid_batch(batcher):
+    async def main():
+        running = asyncio.ensure_future(asyncio.wrap_future(batcher.submit("a")))
+        waiting = asyncio.ensure_future(asyncio.wrap_future(batcher.submit("b")))
+        await asyncio.to_thread(batcher.started.wait, 5)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        batcher.gate.set()
+        assert await asyncio.wait_for(running, 5) == "caption of a"
+        assert await asyncio.wait_for(asyncio.wrap_future(batcher.submit("c")), 5) == "caption of c"
+        assert waiting.cancelled()
+
+    asyncio.run(main())
+    assert batcher._worker.is_alive()
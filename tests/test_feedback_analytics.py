@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from agents.analytics_agent import AnalyticsAgent
+from tools.feedback_analytics import FeedbackAnalytics, FeedbackTable, load_feedback, write_feedback
+
+FEEDBACK = [
+    {"user_id": "zero", "platform": "Tinder", "profile_version": "v1", "swipes": 0, "matches": 0},
+    {"user_id": "zero-matches", "platform": "Bumble", "profile_version": "v1", "swipes": 0, "matches": 4},
+    {"user_id": "low", "platform": "Tinder", "profile_version": "v1", "swipes": 200, "matches": 9},
+    {"user_id": "mid", "platform": "Hinge", "profile_version": "v2", "swipes": 80, "matches": 14},
+    {"user_id": "high", "platform": "Bumble", "profile_version": "v2", "swipes": 40, "matches": 16},
+    {"user_id": "no-average", "platform": "OkCupid", "profile_version": "v1", "swipes": 50, "matches": 3},
+]
+
+
+@pytest.fixture
+def agent(tmp_path):
+    return AnalyticsAgent(feedback_data_path=str(tmp_path / "missing.json"))
+
+
+@pytest.mark.parametrize("batch_size", [4, 10000])
+def test_bulk_report_matches_agent_for_every_tier(agent, batch_size):
+    report = FeedbackAnalytics().analyze(FeedbackTable.from_records(FEEDBACK), by=("user", "platform"))
+    rows = {row["user"]: row for batch in report.iter_batches(batch_size) for row in batch}
+
+    for record in FEEDBACK:
+        row = rows[record["user_id"]]
+        assert row["suggestions"] == agent.generate_recommendations(record), record["user_id"]
+        if record["swipes"]:
+            assert row["engagement_score"] == agent.calculate_engagement_score(record)
+
+    assert rows["zero"]["tier"] == rows["zero-matches"]["tier"] == "no_data"
+
+
+@pytest.mark.parametrize("ext", ["jsonl", "csv"])
+def test_file_loaders_round_trip(tmp_path, ext):
+    table = FeedbackTable.from_records(FEEDBACK)
+    path = str(tmp_path / f"feedback.{ext}")
+    write_feedback(table, path)
+    loaded = load_feedback(path)
+
+    assert loaded.users[loaded.user_codes].tolist() == [r["user_id"] for r in FEEDBACK]
+    assert loaded.platforms[loaded.platform_codes].tolist() == [r["platform"] for r in FEEDBACK]
+    assert loaded.swipes.tolist() == [r["swipes"] for r in FEEDBACK]
+    assert loaded.matches.tolist() == [r["matches"] for r in FEEDBACK]
+
+
+def test_two_value_columns_are_rows_not_encodings(tmp_path):
+    table = FeedbackTable(user_id=("a", "b"), platform=("Tinder", "Hinge"), profile_version=("v1", "v1"),
+                          swipes=[10, 20], matches=[1, 2])
+    assert table.users[table.user_codes].tolist() == ["a", "b"]
+
+    encoded = FeedbackTable.from_encoded(
+        user_id=([1, 0], ["a", "b"]), platform=([0, 0], ["Tinder"]), profile_version=([0, 0], ["v1"]),
+        swipes=[10, 20], matches=[1, 2],
+    )
+    assert encoded.users[encoded.user_codes].tolist() == ["b", "a"]
+
+    path = tmp_path / "single.json"
+    path.write_text(json.dumps(FEEDBACK[2]))
+    assert len(load_feedback(str(path))) == 1
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("torch")
+
+from fastapi.testclient import TestClient
+
+import tools.feedback_stream as feedback_stream
+from bio_api import app
+from tools.feedback_stream import FeedbackAggregator
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(feedback_stream, "_aggregator", FeedbackAggregator(checkpoint_path=None))
+    return TestClient(app)
+
+
+def test_ndjson_feedback_events_are_ingested_and_bad_lines_reported(client):
+    lines = [
+        json.dumps({"platform": "Hinge", "profile_version": "v1", "event": "swipe"}),
+        "{not json",
+        json.dumps({"platform": "Hinge", "profile_version": "v1", "event": "match"}),
+        json.dumps({"platform": "Hinge", "profile_version": "v1", "event": "superlike"}),
+    ]
+    response = client.post("/feedback/events", content="\n".join(lines) + "\n",
+                           headers={"content-type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["received"] == 4
+    assert body["applied"] == 2
+    assert body["rejected"] == 2
+    assert body["errors"][0].startswith("record 2: invalid JSON")
+
+    summary = client.get("/feedback/summary", params={"platform": "Hinge"}).json()
+    assert summary["swipes"] == 1 and summary["matches"] == 1
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+
+from tools.inference_executor import InferenceExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(max_workers=1, intra_op_threads=1, max_pending=1, admission_timeout=5)
+    yield executor
+    executor.shutdown()
+
+
+def test_cancelled_waiter_does_not_leak_its_slot(executor):
+    release = threading.Event()
+
+    async def main():
+        busy = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        # Queued behind the only slot, then cancelled while waiting for admission
+        waiting = asyncio.ensure_future(executor.run(lambda: "never"))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await busy is True
+        assert waiting.cancelled()
+        assert await asyncio.wait_for(executor.run(lambda: "ok"), 5) == "ok"
+
+    asyncio.run(main())
+    assert executor._free_slots == 1
+    assert not executor._waiters
+
+
+def test_cancelled_after_handover_returns_the_slot(executor):
+    async def main():
+        # The slot is handed over, but the caller is cancelled before it resumes
+        waiter = executor._acquire_slot()
+        assert waiter is None
+        queued = asyncio.ensure_future(executor.run(lambda: "never"))
+        await asyncio.sleep(0.05)
+        executor._release_slot()
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(main())
+    assert executor._free_slots == 1
+    assert not executor._waiters
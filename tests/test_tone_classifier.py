@@ -0,0 +1,77 @@
+import json
+import time
+
+import pytest
+
+from tools.tone_classifier import LocalToneClassifier, calibrate_margin
+
+LABELS = ["funny", "confident", "romantic", "witty", "mysterious", "professional", "casual"]
+
+# Realistic bios that are not in prompts/tone_examples.md
+TYPICAL_BIOS = [
+    ("funny", "My cat has more followers than me and honestly she deserves it. Come meet the boss."),
+    ("funny", "I can cook exactly three dishes and two of them are toast. Swipe right if you're hungry anyway."),
+    ("confident", "I work hard, train every morning and I know exactly what I want in a partner."),
+    ("confident", "Ambitious, focused and not afraid to take the lead. I'll plan the date, you just show up."),
+    ("romantic", "Looking for someone to share sunsets, slow dances in the kitchen and lazy Sunday breakfasts."),
+    ("romantic", "I believe in love letters, long walks at dusk and falling for someone a little more every day."),
+    ("witty", "I'd make a joke about procrastination but I'll do it later. Banter is my cardio."),
+    ("witty", "Overthinker with footnotes. My puns are intentional; my sense of direction is not."),
+    ("mysterious", "I rarely talk about where I've been. Ask me the right question over coffee and find out."),
+    ("mysterious", "Some stories are only told at midnight in quiet bookshops. Maybe you'll hear one."),
+    ("professional", "Software architect with an MBA, focused on career growth and looking for a committed partner."),
+    ("professional", "Management consultant who values integrity, punctuality and long-term planning."),
+    ("casual", "Just a chill person into coffee, hikes and tacos. Let's grab a drink and see where it goes."),
+    ("casual", "Easygoing, love brunch, dogs and lazy weekends. Nothing too serious, just good vibes."),
+]
+
+
+@pytest.fixture
+def classifier(tmp_path):
+    clf = LocalToneClassifier(LABELS, log_path=str(tmp_path / "tone_labels.jsonl"))
+    assert clf.ensure_trained()
+    return clf
+
+
+def test_typical_bios_resolve_locally(classifier):
+    resolved = correct = 0
+    for label, bio in TYPICAL_BIOS:
+        predicted, margin = classifier.predict(bio)
+        if classifier.accepts(margin):
+            resolved += 1
+            correct += predicted == label
+    # The common case skips the LLM, and what is answered locally is right
+    assert resolved >= 0.75 * len(TYPICAL_BIOS)
+    assert correct >= 0.9 * resolved
+
+
+def test_calibrate_margin_picks_lowest_margin_meeting_precision():
+    margins = [0.9, 0.8, 0.6, 0.4, 0.2, 0.1]
+    correct = [True, True, True, True, False, False]
+    assert calibrate_margin(margins, correct, 0.8) == 0.2
+    assert calibrate_margin(margins, correct, 1.0) == 0.4
+    assert calibrate_margin([0.5], [False], 0.85) is None
+
+
+def test_refit_runs_in_background_and_keeps_serving(classifier):
+    classifier.retrain_every = 2
+    before = classifier._model
+    classifier.record("Stand-up comedy every Friday, tacos every Saturday.", "funny")
+    classifier.record("I tell dad jokes professionally.", "funny")
+    # The old model answers while the refit is running
+    assert classifier.predict("Coffee and hikes, nothing fancy.")[0] is not None
+    deadline = time.time() + 30
+    while classifier._model is before and time.time() < deadline:
+        time.sleep(0.05)
+    assert classifier._model is not before
+    assert classifier.stats_snapshot()["retrains"] == 2
+
+
+def test_label_log_is_capped(tmp_path):
+    log_path = tmp_path / "tone_labels.jsonl"
+    clf = LocalToneClassifier(LABELS, log_path=str(log_path), max_logged=8, retrain_every=10_000)
+    for i in range(25):
+        clf.record(f"bio number {i}", "casual")
+    lines = log_path.read_text().splitlines()
+    assert len(lines) <= 10
+    assert json.loads(lines[-1])["text"] == "bio number 24"
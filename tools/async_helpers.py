@@ -0,0 +1,30 @@
+# tools/async_helpers.py
+import asyncio
+import time
+
+
+async def timed(coro):
+    """Await `coro`, returning (result, elapsed milliseconds)."""
+    start = time.perf_counter()
+    result = await coro
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+async def run_branches(*coros) -> list:
+    """
+    Run independent branches side by side and return their results in order.
+    Unlike asyncio.gather, the first failure cancels the siblings (and waits for
+    them to unwind) before it is re-raised, so no branch keeps running orphaned;
+    cancelling the caller cancels every branch too.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        failed = next((task for task in tasks if task in done and not task.cancelled() and task.exception()), None)
+        if failed is not None:
+            raise failed.exception()
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,193 @@
+# tools/caption_service.py
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from tools.inference_backend import inference_context
+from tools.model_registry import get_model_registry, default_device
+
+
+class CaptionBatcher:
+    """
+    In-process dynamic batcher for BLIP captioning.
+    Images submitted from any request are collected for up to `max_wait_ms`
+    (or until `max_batch_size` is reached) and captioned with one batched
+    `generate` call. Each caller gets a Future for its own caption; async
+    callers should await `submit()` through `asyncio.wrap_future` rather than
+    block a worker thread in `caption()`, so a batch can fill beyond the
+    number of worker threads.
+    """
+
+    def __init__(self, model, processor, device,
+                 max_batch_size=8, max_wait_ms=15, max_queue_depth=64,
+                 generate_kwargs=None):
+        self.model = model
+        self.processor = processor
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.generate_kwargs = generate_kwargs or {
+            "max_new_tokens": 80,
+            "num_beams": 5,
+            "length_penalty": 1.2,
+            "early_stopping": True,
+        }
+
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._batches = deque(maxlen=200)
+        self._totals = {"batches": 0, "images": 0, "rejected": 0}
+        self._stats_lock = threading.Lock()
+        self._stopped = threading.Event()
+        # Orders submit() against shutdown() so nothing is queued after the final drain
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="caption-batcher", daemon=True)
+        self._worker.start()
+
+    # ---------- Public API -------------------------------------------------- #
+
+    def submit(self, image) -> Future:
+        future = Future()
+        with self._submit_lock:
+            if self._stopped.is_set():
+                raise RuntimeError("Caption service is shut down")
+            try:
+                self._queue.put_nowait((image, future, time.perf_counter()))
+            except queue.Full:
+                with self._stats_lock:
+                    self._totals["rejected"] += 1
+                raise RuntimeError("Caption queue is full, try again shortly")
+        return future
+
+    def caption(self, image, timeout=None) -> str:
+        return self.submit(image).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            recent = list(self._batches)
+            totals = dict(self._totals)
+        if recent:
+            totals["avg_batch_size"] = round(sum(b["size"] for b in recent) / len(recent), 2)
+            totals["avg_occupancy"] = round(sum(b["occupancy"] for b in recent) / len(recent), 2)
+            totals["avg_wait_ms"] = round(sum(b["avg_wait_ms"] for b in recent) / len(recent), 1)
+            totals["max_wait_ms"] = max(b["max_wait_ms"] for b in recent)
+        totals["queue_depth"] = self._queue.qsize()
+        totals["recent_batches"] = recent[-10:]
+        return totals
+
+    def shutdown(self):
+        with self._submit_lock:
+            self._stopped.set()
+        self._worker.join(timeout=5)
+        # Whatever the worker did not pick up would otherwise leave its caller waiting forever
+        error = RuntimeError("Caption service shut down before the image was captioned")
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    # ---------- Internal helpers ------------------------------------------- #
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            # Claim every future first: callers that cancelled while queued (a disconnected
+            # stream, a cancelled sibling branch) drop out, and the rest can no longer be cancelled
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            images = [item[0] for item in batch]
+            futures = [item[1] for item in batch]
+            waits = [(started - item[2]) * 1000 for item in batch]
+
+            try:
+                captions = self._generate(images)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, caption in zip(futures, captions):
+                    future.set_result(caption)
+
+            self._record(len(batch), waits, (time.perf_counter() - started) * 1000)
+
+    def _generate(self, images) -> list:
+        inputs = self.processor(
+            images=images, text=[""] * len(images), return_tensors="pt", padding=True
+        ).to(self.device)
+        with inference_context(self.model):
+            out_ids = self.model.generate(**inputs, **self.generate_kwargs)
+        return [
+            self.processor.decode(ids, skip_special_tokens=True).strip()
+            for ids in out_ids
+        ]
+
+    def _record(self, size, waits, generate_ms):
+        with self._stats_lock:
+            self._totals["batches"] += 1
+            self._totals["images"] += size
+            self._batches.append({
+                "size": size,
+                "occupancy": round(size / self.max_batch_size, 2),
+                "avg_wait_ms": round(sum(waits) / size, 1),
+                "max_wait_ms": round(max(waits), 1),
+                "generate_ms": round(generate_ms, 1),
+            })
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_caption_service() -> CaptionBatcher:
+    """Process-wide captioner built on the shared BLIP model."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            device = default_device()
+            model, processor = get_model_registry().get_blip(device=device)
+            _service = CaptionBatcher(
+                model, processor, device,
+                max_batch_size=int(os.getenv("MATCHMAX_CAPTION_BATCH_SIZE", "8")),
+                max_wait_ms=float(os.getenv("MATCHMAX_CAPTION_MAX_WAIT_MS", "15")),
+                max_queue_depth=int(os.getenv("MATCHMAX_CAPTION_QUEUE_DEPTH", "64")),
+            )
+        return _service
+
+
+def caption_service_stats() -> dict:
+    return _service.stats() if _service is not None else {}
+
+
+def shutdown_caption_service():
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.shutdown()
+            _service = None
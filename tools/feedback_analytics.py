@@ -0,0 +1,413 @@
+# tools/feedback_analytics.py
+"""
+Columnar swipe/match analytics for many users, platforms and profile versions.
+
+    python -m tools.feedback_analytics data/feedback.jsonl --by user,platform --out data/cohorts.jsonl
+    python -m tools.feedback_analytics --benchmark 1000000 --format csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+GROUP_KEYS = ("user", "platform", "version")
+
+# vs-average buckets
+BELOW_AVERAGE, ABOVE_AVERAGE, NO_AVERAGE = 0, 1, 2
+VS_AVERAGE_LABELS = np.array(["below", "above", "unknown"], dtype=object)
+# engagement tiers (AnalyticsAgent thresholds)
+TIER_LOW, TIER_MID, TIER_HIGH, TIER_NO_DATA = 0, 1, 2, 3
+TIER_LABELS = np.array(["low", "mid", "high", "no_data"], dtype=object)
+LOW_ENGAGEMENT = 10
+MID_ENGAGEMENT = 25
+
+TIER_SUGGESTIONS = {
+    TIER_LOW: [
+        "⬆️ Try using a different primary photo—smiling or candid works best.",
+        "📝 Consider shortening your bio or using simpler, playful language.",
+    ],
+    TIER_MID: ["💡 Your profile is decent—try rotating a new photo or tweaking one line in your bio."],
+    TIER_HIGH: ["🔥 Strong engagement! You could test alternate versions just for fun."],
+    TIER_NO_DATA: ["⚠️ No feedback data to analyze."],
+}
+
+
+def engagement_scores(swipes: np.ndarray, matches: np.ndarray) -> np.ndarray:
+    """matches / swipes as a percentage (2 dp); 0 where there are no swipes."""
+    rate = np.zeros(len(swipes), dtype=np.float64)
+    np.divide(matches, swipes, out=rate, where=swipes > 0)
+    return np.round(rate * 100, 2)
+
+
+def engagement_score(swipes: int, matches: int) -> float:
+    """Scalar `engagement_scores`: one rounding rule for AnalyticsAgent and the bulk report."""
+    return float(engagement_scores(np.array([swipes], dtype=np.float64), np.array([matches], dtype=np.float64))[0])
+
+
+def engagement_tiers(engagement: np.ndarray, swipes: np.ndarray) -> np.ndarray:
+    """Tier per row; rows without swipes have no data to score, whatever their match count."""
+    return np.select(
+        [swipes <= 0, engagement < LOW_ENGAGEMENT, engagement < MID_ENGAGEMENT],
+        [TIER_NO_DATA, TIER_LOW, TIER_MID],
+        default=TIER_HIGH,
+    ).astype(np.int8)
+
+
+def engagement_tier(score: float, swipes: int) -> int:
+    """Scalar `engagement_tiers`, so AnalyticsAgent and the bulk report bucket identically."""
+    return int(engagement_tiers(np.array([score], dtype=np.float64), np.array([swipes]))[0])
+
+
+def average_suggestion(bucket: int, platform: str, avg_rate) -> list:
+    if bucket == BELOW_AVERAGE:
+        return [f"📉 You're below {platform}'s average engagement rate ({avg_rate}%). Try improving your first photo or bio hook."]
+    if bucket == ABOVE_AVERAGE:
+        return [f"📈 You're performing better than average on {platform}. Keep it up!"]
+    return []
+
+
+FIELDS = ("user_id", "platform", "profile_version", "swipes", "matches")
+STRING_FIELDS = FIELDS[:3]
+# JSONL lines parsed per json.loads call: one C-level parse per chunk instead of per row
+LOAD_CHUNK_ROWS = 100000
+
+
+class FeedbackTable:
+    """
+    Feedback rows as NumPy columns. String columns are dictionary-encoded:
+    `<name>_codes` is an int32 array indexing into the `<name>s` vocabulary.
+    """
+
+    def __init__(self, user_id, platform, profile_version, swipes, matches):
+        self._set_columns(_encode(user_id), _encode(platform), _encode(profile_version), swipes, matches)
+
+    def _set_columns(self, users, platforms, versions, swipes, matches):
+        self.user_codes, self.users = users
+        self.platform_codes, self.platforms = platforms
+        self.version_codes, self.versions = versions
+        self.swipes = np.asarray(swipes, dtype=np.int64)
+        self.matches = np.asarray(matches, dtype=np.int64)
+
+    @classmethod
+    def from_encoded(cls, user_id, platform, profile_version, swipes, matches):
+        """Build from already dictionary-encoded string columns, each given as (codes, vocabulary)."""
+        table = cls.__new__(cls)
+        table._set_columns(
+            *(
+                (np.asarray(codes, dtype=np.int32), np.asarray(vocab, dtype=object))
+                for codes, vocab in (user_id, platform, profile_version)
+            ),
+            swipes, matches,
+        )
+        return table
+
+    def __len__(self):
+        return len(self.swipes)
+
+    def codes(self, key: str):
+        return {"user": (self.user_codes, self.users),
+                "platform": (self.platform_codes, self.platforms),
+                "version": (self.version_codes, self.versions)}[key]
+
+    @classmethod
+    def from_records(cls, records):
+        return cls(**_record_columns(records if isinstance(records, list) else list(records)))
+
+
+def _record_columns(rows: list) -> dict:
+    """Column lists from a list of feedback dicts; missing fields get the single-feedback defaults."""
+    columns = {name: [row.get(name, "unknown") for row in rows] for name in STRING_FIELDS}
+    for name in ("swipes", "matches"):
+        columns[name] = _int_column([row.get(name) or 0 for row in rows])
+    return columns
+
+
+def _int_column(values) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.int64)
+    except (TypeError, ValueError):
+        # Mixed or float-formatted strings ("3.0"): fall back to int() per value
+        return np.array([int(float(v)) for v in values], dtype=np.int64)
+
+
+def _encode(values):
+    # Sort fixed-width unicode, not Python objects: np.unique over an object array is several times slower
+    values = np.asarray(values)
+    if values.dtype.kind != "U":
+        values = values.astype(str)
+    vocab, codes = np.unique(values, return_inverse=True)
+    return codes.astype(np.int32), vocab.astype(object)
+
+
+def _load_jsonl(f) -> dict:
+    strings = {name: [] for name in STRING_FIELDS}
+    counts = {"swipes": [], "matches": []}
+    while True:
+        lines = [line for line in itertools.islice(f, LOAD_CHUNK_ROWS) if line.strip()]
+        if not lines:
+            break
+        chunk = _record_columns(json.loads("[" + ",".join(lines) + "]"))
+        for name, column in strings.items():
+            column.extend(chunk[name])
+        for name, parts in counts.items():
+            parts.append(chunk[name])
+    return {
+        **strings,
+        **{name: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64) for name, parts in counts.items()},
+    }
+
+
+def _load_csv(f) -> dict:
+    header = next(csv.reader([f.readline()]), [])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # header-only files: "input contained no data"
+        cells = np.loadtxt(f, dtype=str, delimiter=",", quotechar='"', comments=None, ndmin=2)
+    index = {name.strip(): i for i, name in enumerate(header)}
+    columns = {}
+    for name in FIELDS:
+        column = cells[:, index[name]] if name in index and len(cells) else None
+        if name in STRING_FIELDS:
+            columns[name] = column if column is not None else np.full(len(cells), "unknown", dtype=object)
+        elif column is None:
+            columns[name] = np.zeros(len(cells), dtype=np.int64)
+        else:
+            columns[name] = _int_column(np.where(column == "", "0", column) if (column == "").any() else column)
+    return columns
+
+
+def load_feedback(path: str) -> FeedbackTable:
+    """
+    Bulk-load JSONL/NDJSON, CSV, or a JSON list / single feedback dict into columns.
+    CSV goes through np.loadtxt; JSONL is parsed a chunk of lines per json.loads call.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", newline="") as f:
+        if ext in (".jsonl", ".ndjson"):
+            return FeedbackTable(**_load_jsonl(f))
+        if ext == ".csv":
+            return FeedbackTable(**_load_csv(f))
+        data = json.load(f)
+        return FeedbackTable.from_records(data if isinstance(data, list) else [data])
+
+
+def write_feedback(table: FeedbackTable, path: str) -> int:
+    """Write a table back out as JSONL or CSV (by extension); used for end-to-end benchmarks."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    columns = (
+        table.users[table.user_codes], table.platforms[table.platform_codes],
+        table.versions[table.version_codes], table.swipes.tolist(), table.matches.tolist(),
+    )
+    with open(path, "w", newline="") as f:
+        if os.path.splitext(path)[1].lower() == ".csv":
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(zip(*columns))
+        else:
+            f.writelines(json.dumps(dict(zip(FIELDS, row))) + "\n" for row in zip(*columns))
+    return len(table)
+
+
+class CohortReport:
+    """One row per group; every column is a NumPy array of equal length."""
+
+    def __init__(self, by, keys, swipes, matches, engagement, platform_avg, vs_average, tier):
+        self.by = by
+        self.keys = keys  # {group key: object array of labels}
+        self.swipes = swipes
+        self.matches = matches
+        self.engagement = engagement
+        self.platform_avg = platform_avg
+        self.vs_average = vs_average
+        self.tier = tier
+
+    def __len__(self):
+        return len(self.swipes)
+
+    @staticmethod
+    def _suggestions(tier: int, bucket: int, platform: str, avg) -> list:
+        if tier == TIER_NO_DATA:
+            return TIER_SUGGESTIONS[tier]
+        return average_suggestion(bucket, platform, avg) + TIER_SUGGESTIONS[tier]
+
+    def iter_batches(self, batch_size: int = 10000):
+        """
+        Rows as dicts, `batch_size` at a time, so large reports never materialise at once.
+        Each batch is zipped from column slices; suggestions are built once per distinct
+        (tier, bucket, platform, average), which the rows share.
+        """
+        names = self.by + ("swipes", "matches", "engagement_score", "platform_average", "vs_average", "tier", "suggestions")
+        suggestions = {}
+        for start in range(0, len(self), batch_size):
+            rows = slice(start, min(start + batch_size, len(self)))
+            avg = self.platform_avg[rows].astype(object)
+            avg[np.isnan(self.platform_avg[rows])] = None
+            avg = avg.tolist()
+            tier = self.tier[rows].tolist()
+            vs_average = self.vs_average[rows].tolist()
+            platforms = self.keys["platform"][rows].tolist() if "platform" in self.by else itertools.repeat("this platform")
+            combos = list(zip(tier, vs_average, platforms, avg))
+            for combo in set(combos) - suggestions.keys():
+                suggestions[combo] = self._suggestions(*combo)
+            columns = [self.keys[key][rows].tolist() for key in self.by] + [
+                self.swipes[rows].tolist(),
+                self.matches[rows].tolist(),
+                self.engagement[rows].tolist(),
+                avg,
+                VS_AVERAGE_LABELS[self.vs_average[rows]].tolist(),
+                TIER_LABELS[self.tier[rows]].tolist(),
+                [suggestions[combo] for combo in combos],
+            ]
+            yield [dict(zip(names, values)) for values in zip(*columns)]
+
+    def to_jsonl(self, path: str, batch_size: int = 10000) -> int:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for batch in self.iter_batches(batch_size):
+                f.write("".join(json.dumps(row) + "\n" for row in batch))
+        return len(self)
+
+    def summary(self) -> dict:
+        return {
+            "groups": len(self),
+            "tiers": dict(zip(TIER_LABELS.tolist(), np.bincount(self.tier, minlength=4).tolist())),
+            "vs_average": dict(zip(VS_AVERAGE_LABELS.tolist(), np.bincount(self.vs_average, minlength=3).tolist())),
+        }
+
+
+class FeedbackAnalytics:
+    """Vectorized engagement, platform comparison and recommendation buckets for a FeedbackTable."""
+
+    def __init__(self, metadata_path="data/platform_metadata.json"):
+        try:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            print(f"⚠️ Metadata file not found: {metadata_path}")
+            metadata = {}
+        self.platform_averages = {
+            name: float(info["average_engagement_rate"])
+            for name, info in metadata.items()
+            if info.get("average_engagement_rate")
+        }
+
+    @staticmethod
+    def engagement(swipes: np.ndarray, matches: np.ndarray) -> np.ndarray:
+        return engagement_scores(swipes, matches)
+
+    def platform_average(self, platform_codes: np.ndarray, platforms: np.ndarray) -> np.ndarray:
+        lookup = np.array([self.platform_averages.get(p, np.nan) for p in platforms], dtype=np.float64)
+        return lookup[platform_codes] if len(lookup) else np.full(len(platform_codes), np.nan)
+
+    @staticmethod
+    def buckets(engagement: np.ndarray, swipes: np.ndarray, platform_avg: np.ndarray):
+        vs_average = np.where(
+            np.isnan(platform_avg), NO_AVERAGE, np.where(engagement < platform_avg, BELOW_AVERAGE, ABOVE_AVERAGE)
+        ).astype(np.int8)
+        return vs_average, engagement_tiers(engagement, swipes)
+
+    def analyze(self, table: FeedbackTable, by=("user", "platform", "version")) -> CohortReport:
+        """Aggregate swipes/matches per `by` group, then score and bucket every group in one pass."""
+        by = tuple(by)
+        unknown = set(by) - set(GROUP_KEYS)
+        if unknown or not by:
+            raise ValueError(f"Group keys must be a non-empty subset of {GROUP_KEYS}, got {by}")
+
+        codes = [table.codes(key) for key in by]
+        sizes = tuple(max(len(vocab), 1) for _, vocab in codes)
+        combined = np.ravel_multi_index(tuple(c for c, _ in codes), sizes)
+        group_ids, inverse = np.unique(combined, return_inverse=True)
+
+        swipes = np.bincount(inverse, weights=table.swipes, minlength=len(group_ids)).astype(np.int64)
+        matches = np.bincount(inverse, weights=table.matches, minlength=len(group_ids)).astype(np.int64)
+        group_codes = np.unravel_index(group_ids, sizes)
+        keys = {key: vocab[gc] for key, (_, vocab), gc in zip(by, codes, group_codes)}
+
+        engagement = self.engagement(swipes, matches)
+        if "platform" in by:
+            platform_avg = self.platform_average(group_codes[by.index("platform")], table.platforms)
+        else:
+            platform_avg = np.full(len(group_ids), np.nan)
+        vs_average, tier = self.buckets(engagement, swipes, platform_avg)
+        return CohortReport(by, keys, swipes, matches, engagement, platform_avg, vs_average, tier)
+
+
+def synthetic_table(n_rows: int, n_users: int = 100000, n_versions: int = 20, seed: int = 7) -> FeedbackTable:
+    rng = np.random.default_rng(seed)
+    platforms = np.array(["Tinder", "Bumble", "Hinge", "OkCupid"], dtype=object)
+    versions = np.array([f"v{i}" for i in range(n_versions)], dtype=object)
+    users = np.array([f"u{i}" for i in range(n_users)], dtype=object)
+    swipes = rng.integers(0, 200, n_rows)
+    matches = rng.binomial(swipes, rng.uniform(0.02, 0.35, n_rows))
+    return FeedbackTable.from_encoded(
+        user_id=(rng.integers(0, n_users, n_rows), users),
+        platform=(rng.integers(0, len(platforms), n_rows), platforms),
+        profile_version=(rng.integers(0, n_versions, n_rows), versions),
+        swipes=swipes,
+        matches=matches,
+    )
+
+
+def benchmark(n_rows: int = 1_000_000, by=GROUP_KEYS, metadata_path="data/platform_metadata.json",
+              path=None, fmt="jsonl") -> dict:
+    """
+    End to end from a file: load, analyze and emit every group. Without `path`, a
+    synthetic `n_rows` file in `fmt` (jsonl / csv) is written to a temp dir first (untimed).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        if path is None:
+            path = os.path.join(tmp, f"feedback.{fmt}")
+            write_feedback(synthetic_table(n_rows), path)
+        start = time.perf_counter()
+        table = load_feedback(path)
+        load_s = time.perf_counter() - start
+    analytics = FeedbackAnalytics(metadata_path)
+    start = time.perf_counter()
+    report = analytics.analyze(table, by=by)
+    analyze_s = time.perf_counter() - start
+    start = time.perf_counter()
+    emitted = sum(len(batch) for batch in report.iter_batches())
+    emit_s = time.perf_counter() - start
+    total_s = load_s + analyze_s + emit_s
+    return {
+        "rows": len(table),
+        "groups": len(report),
+        "load_s": round(load_s, 3),
+        "analyze_s": round(analyze_s, 3),
+        "emit_s": round(emit_s, 3),
+        "total_s": round(total_s, 3),
+        "rows_per_s": int(len(table) / total_s) if total_s else None,
+        "groups_emitted": emitted,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cohort engagement analytics over feedback files")
+    parser.add_argument("path", nargs="?", help="feedback .jsonl / .csv / .json")
+    parser.add_argument("--by", default="user,platform,version", help="comma-separated subset of user,platform,version")
+    parser.add_argument("--out", default=None, help="write one JSON line per group here")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="ROWS",
+                        help="time load + analyze + emit on a synthetic file (or on `path` if given)")
+    parser.add_argument("--format", default="jsonl", choices=("jsonl", "csv"), help="synthetic benchmark file format")
+    args = parser.parse_args()
+    by = [k.strip() for k in args.by.split(",") if k.strip()]
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.benchmark, by=by, path=args.path, fmt=args.format), indent=2))
+    elif args.path:
+        start = time.perf_counter()
+        table = load_feedback(args.path)
+        loaded = time.perf_counter() - start
+        report = FeedbackAnalytics().analyze(table, by=by)
+        print(f"📥 Loaded {len(table)} rows in {loaded:.2f}s → {len(report)} groups")
+        print(json.dumps(report.summary(), indent=2))
+        if args.out:
+            report.to_jsonl(args.out)
+            print(f"💾 Cohort report saved to {args.out}")
+    else:
+        parser.error("give a feedback file or --benchmark ROWS")
@@ -0,0 +1,367 @@
+# tools/feedback_stream.py
+"""
+Live swipe/match aggregates per platform and profile version over sliding windows.
+
+    agg = get_feedback_aggregator()
+    agg.ingest({"platform": "Hinge", "profile_version": "v3", "event": "swipe"})
+    agg.ingest_many(events)                  # micro-batch
+    agg.snapshot("Hinge", "v3", "24h")       # {"platform", "swipes", "matches", ...}
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+CHECKPOINT_FORMAT = 1
+ALL_VERSIONS = "*"
+DEFAULT_WINDOWS = "1h,24h,7d"
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_windows(spec: str) -> dict:
+    """'1h,24h,7d' → {"1h": 3600, "24h": 86400, "7d": 604800}."""
+    windows = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part[-1] not in _UNITS or not part[:-1].isdigit() or int(part[:-1]) <= 0:
+            raise ValueError(f"Invalid feedback window {part!r} (expected e.g. 90s, 15m, 24h, 7d)")
+        windows[part] = int(part[:-1]) * _UNITS[part[-1]]
+    return windows
+
+
+def _timestamp(value) -> float:
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def parse_event(event: dict):
+    """
+    (platform, profile_version, ts, swipes, matches) from either a single
+    event ({"event": "swipe" | "match"}) or a counted one ({"swipes": n, "matches": m}).
+    """
+    kind = event.get("event")
+    if kind == "swipe":
+        swipes, matches = 1, 0
+    elif kind == "match":
+        swipes, matches = 0, 1
+    elif kind is None:
+        swipes, matches = int(event.get("swipes", 0) or 0), int(event.get("matches", 0) or 0)
+    else:
+        raise ValueError(f"Unknown feedback event {kind!r} (expected 'swipe' or 'match')")
+    if swipes < 0 or matches < 0:
+        raise ValueError("Feedback counts must be non-negative")
+    platform = str(event.get("platform") or "unknown")
+    version = str(event.get("profile_version") or "unknown")
+    return platform, version, _timestamp(event.get("ts", event.get("timestamp"))), swipes, matches
+
+
+class _Window:
+    """
+    Ring of `n` time buckets covering `span` seconds with running totals.
+    Adding an event and reading the totals are amortised O(1): expired buckets are
+    subtracted from the totals as the head moves forward, each one at most once.
+    Resolution is span / n, so an event leaves the window within one bucket of its age.
+    """
+
+    __slots__ = ("width", "swipes", "matches", "total_swipes", "total_matches", "head")
+
+    def __init__(self, span: float, n: int):
+        self.width = span / n
+        self.swipes = [0] * n
+        self.matches = [0] * n
+        self.total_swipes = 0
+        self.total_matches = 0
+        self.head = None  # absolute index of the newest bucket
+
+    def _advance(self, index: int):
+        if self.head is None:
+            self.head = index
+            return
+        n = len(self.swipes)
+        for step in range(1, min(index - self.head, n) + 1):
+            slot = (self.head + step) % n
+            self.total_swipes -= self.swipes[slot]
+            self.total_matches -= self.matches[slot]
+            self.swipes[slot] = self.matches[slot] = 0
+        self.head = max(self.head, index)
+
+    def add(self, ts: float, swipes: int, matches: int):
+        index = int(ts // self.width)
+        self._advance(index)
+        if index <= self.head - len(self.swipes):
+            return  # older than the whole window
+        slot = index % len(self.swipes)
+        self.swipes[slot] += swipes
+        self.matches[slot] += matches
+        self.total_swipes += swipes
+        self.total_matches += matches
+
+    def totals(self, now: float):
+        self._advance(int(now // self.width))
+        return self.total_swipes, self.total_matches
+
+    def state(self) -> dict:
+        return {"head": self.head, "swipes": self.swipes, "matches": self.matches}
+
+    def restore(self, state: dict):
+        if len(state["swipes"]) != len(self.swipes):
+            return False
+        self.head = state["head"]
+        self.swipes = list(state["swipes"])
+        self.matches = list(state["matches"])
+        self.total_swipes = sum(self.swipes)
+        self.total_matches = sum(self.matches)
+        return True
+
+
+class _Counters:
+    __slots__ = ("swipes", "matches", "last_event", "windows")
+
+    def __init__(self, windows: dict, buckets: int):
+        self.swipes = 0
+        self.matches = 0
+        self.last_event = None
+        self.windows = {name: _Window(span, buckets) for name, span in windows.items()}
+
+    def add(self, ts, swipes, matches):
+        self.swipes += swipes
+        self.matches += matches
+        self.last_event = ts if self.last_event is None else max(self.last_event, ts)
+        for window in self.windows.values():
+            window.add(ts, swipes, matches)
+
+
+class FeedbackAggregator:
+    """
+    Streaming replacement for re-reading performance_feedback.json.
+    Every event updates the all-time counters and each sliding window for its
+    (platform, profile_version) and for the platform as a whole (version "*").
+    Checkpoints are compact JSON, written atomically every `checkpoint_every`
+    events and on `save_checkpoint()`, and restored on start-up.
+    Events stamped more than one bucket in the future are rejected: they would
+    move every ring's head forward and empty the live windows.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS, buckets=60, checkpoint_path=None, checkpoint_every=1000):
+        self.windows = parse_windows(windows) if isinstance(windows, str) else dict(windows)
+        self.buckets = buckets
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.events = 0
+        self.rejected = 0
+        self.last_platform = None
+
+        # Clock skew tolerated on event timestamps: the finest bucket of any window
+        self.max_future = min(self.windows.values()) / buckets if self.windows else 0.0
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._counters = {}
+        self._since_checkpoint = 0
+        # Snapshots are numbered under _lock; a save never overwrites a newer one it raced with
+        self._snapshot_seq = 0
+        self._written_seq = {}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self.load_checkpoint(checkpoint_path)
+
+    def _key(self, platform, version) -> _Counters:
+        key = (platform, version)
+        if key not in self._counters:
+            self._counters[key] = _Counters(self.windows, self.buckets)
+        return self._counters[key]
+
+    # ---------- ingestion ------------------------------------------------- #
+
+    def _apply(self, event, now):
+        try:
+            platform, version, ts, swipes, matches = parse_event(event)
+            if ts > now + self.max_future:
+                raise ValueError(f"timestamp {ts:.0f} is {ts - now:.0f}s in the future")
+        except (TypeError, ValueError, AttributeError) as e:
+            self.rejected += 1
+            print(f"⚠️ Skipping feedback event {event!r}: {e}")
+            return False
+        self._key(platform, version).add(ts, swipes, matches)
+        if version != ALL_VERSIONS:
+            self._key(platform, ALL_VERSIONS).add(ts, swipes, matches)
+        self.last_platform = platform
+        self.events += 1
+        self._since_checkpoint += 1
+        return True
+
+    def ingest(self, event: dict) -> bool:
+        return self.ingest_many([event]) == 1
+
+    def ingest_many(self, events) -> int:
+        """Apply a micro-batch under one lock; invalid events are counted and skipped. Returns the number applied."""
+        with self._lock:
+            now = time.time()
+            applied = sum(self._apply(event, now) for event in events)
+            due = self.checkpoint_path and self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every
+        if due:
+            self.save_checkpoint()
+        return applied
+
+    def ingest_file(self, path: str) -> int:
+        """Replay a JSONL event log, or the legacy single-dict feedback JSON."""
+        with open(path, "r") as f:
+            if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+                events = [json.loads(line) for line in f if line.strip()]
+            else:
+                data = json.load(f)
+                events = data if isinstance(data, list) else [data]
+        return self.ingest_many(events)
+
+    # ---------- queries --------------------------------------------------- #
+
+    def snapshot(self, platform=None, profile_version=None, window=None, now=None) -> dict:
+        """
+        Current counts for one platform (default: the most recent event's) and
+        version (default: all versions), all-time or over `window`. {} if nothing was
+        seen in that window, so callers fall back to their "no data" answer.
+        """
+        if window is not None and window not in self.windows:
+            raise ValueError(f"Unknown feedback window {window!r} (configured: {', '.join(self.windows)})")
+        with self._lock:
+            platform = platform or self.last_platform
+            counters = self._counters.get((platform, profile_version or ALL_VERSIONS))
+            if counters is None:
+                return {}
+            if window is None:
+                swipes, matches = counters.swipes, counters.matches
+            else:
+                swipes, matches = counters.windows[window].totals(now or time.time())
+            last_event = counters.last_event
+        if not swipes and not matches:
+            return {}
+        return {
+            "platform": platform,
+            "profile_version": profile_version or ALL_VERSIONS,
+            "window": window or "all",
+            "swipes": swipes,
+            "matches": matches,
+            "last_event": last_event,
+        }
+
+    def keys(self) -> list:
+        with self._lock:
+            return sorted(k for k in self._counters if k[1] != ALL_VERSIONS)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "events": self.events,
+                "rejected": self.rejected,
+                "keys": sum(1 for k in self._counters if k[1] != ALL_VERSIONS),
+                "windows": list(self.windows),
+                "buckets": self.buckets,
+                "checkpoint_path": self.checkpoint_path,
+                "events_since_checkpoint": self._since_checkpoint,
+            }
+
+    # ---------- checkpoints ----------------------------------------------- #
+
+    def _checkpoint_state(self) -> dict:
+        return {
+            "format": CHECKPOINT_FORMAT,
+            "saved_at": time.time(),
+            "windows": self.windows,
+            "buckets": self.buckets,
+            "events": self.events,
+            "rejected": self.rejected,
+            "last_platform": self.last_platform,
+            "keys": [
+                {
+                    "platform": platform,
+                    "profile_version": version,
+                    "swipes": c.swipes,
+                    "matches": c.matches,
+                    "last_event": c.last_event,
+                    "windows": {name: w.state() for name, w in c.windows.items()},
+                }
+                for (platform, version), c in self._counters.items()
+            ],
+        }
+
+    def save_checkpoint(self, path=None) -> str:
+        path = path or self.checkpoint_path
+        if not path:
+            raise ValueError("No checkpoint path configured")
+        with self._lock:
+            state = json.dumps(self._checkpoint_state(), separators=(",", ":"))
+            self._since_checkpoint = 0
+            self._snapshot_seq += 1
+            seq = self._snapshot_seq
+        # Write-then-rename so a crash never leaves a half-written checkpoint behind
+        with self._save_lock:
+            if seq < self._written_seq.get(path, 0):
+                return path  # a newer snapshot already reached this path
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(state)
+            os.replace(tmp_path, path)
+            self._written_seq[path] = seq
+        return path
+
+    def load_checkpoint(self, path=None):
+        path = path or self.checkpoint_path
+        with open(path, "r") as f:
+            state = json.load(f)
+        if state.get("format") != CHECKPOINT_FORMAT:
+            print(f"⚠️ Ignoring feedback checkpoint {path}: unsupported format {state.get('format')!r}")
+            return
+        same_layout = state.get("buckets") == self.buckets
+        dropped = set()
+        with self._lock:
+            self._counters = {}
+            for entry in state["keys"]:
+                counters = self._key(entry["platform"], entry["profile_version"])
+                counters.swipes = entry["swipes"]
+                counters.matches = entry["matches"]
+                counters.last_event = entry.get("last_event")
+                for name, window in counters.windows.items():
+                    saved = entry["windows"].get(name)
+                    # Only restore rings with the same span and resolution; others start empty
+                    if not (same_layout and saved and state["windows"].get(name) == self.windows[name] and window.restore(saved)):
+                        dropped.add(name)
+            self.events = state.get("events", 0)
+            self.rejected = state.get("rejected", 0)
+            self.last_platform = state.get("last_platform")
+            self._since_checkpoint = 0
+        if dropped:
+            print(f"⚠️ Feedback windows {', '.join(sorted(dropped))} changed since {path}; they restart empty.")
+        print(f"📥 Restored feedback aggregates for {len(self.keys())} profile version(s) from {path}")
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_feedback_aggregator() -> FeedbackAggregator:
+    """Process-wide aggregator, configured from MATCHMAX_FEEDBACK_* on first use."""
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            _aggregator = FeedbackAggregator(
+                windows=os.getenv("MATCHMAX_FEEDBACK_WINDOWS", DEFAULT_WINDOWS),
+                buckets=int(os.getenv("MATCHMAX_FEEDBACK_BUCKETS", "60")),
+                checkpoint_path=os.getenv("MATCHMAX_FEEDBACK_CHECKPOINT", "data/feedback_checkpoint.json") or None,
+                checkpoint_every=int(os.getenv("MATCHMAX_FEEDBACK_CHECKPOINT_EVERY", "1000")),
+            )
+        return _aggregator
+
+
+def save_feedback_checkpoint():
+    """Checkpoint the aggregator if one was ever created (never builds one just to save it)."""
+    with _aggregator_lock:
+        aggregator = _aggregator
+    if aggregator is not None and aggregator.checkpoint_path:
+        return aggregator.save_checkpoint()
+    return None
@@ -0,0 +1,63 @@
+# tools/image_artifacts.py
+import base64
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+from tools.image_optim_tool import optimize_image
+
+MODEL_SIZE = (224, 224)
+THUMB_SIZE = (300, 300)
+# Bump whenever the way the model input is derived changes (it affects embeddings and scores)
+ARTIFACTS_VERSION = "thumb-derived-1"
+
+
+def artifacts_fingerprint_parts() -> tuple:
+    """What the photo cache fingerprint needs to know about how model inputs are produced."""
+    return ARTIFACTS_VERSION, THUMB_SIZE, MODEL_SIZE
+
+
+class ImageArtifacts:
+    """
+    Everything a request needs from one upload, derived from a single decode:
+    the model-ready image, the 300×300 thumbnail and its encoded forms.
+    Encoded bytes are produced lazily and memoised.
+    """
+
+    def __init__(self, filename: str, thumbnail: Image.Image, model_size=MODEL_SIZE):
+        self.filename = filename
+        self.thumbnail = thumbnail
+        self.model_image = thumbnail.copy()
+        self.model_image.thumbnail(model_size, Image.LANCZOS)
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def thumbnail_bytes(self, fmt: str = None) -> bytes:
+        """Thumbnail encoded in the upload's own format (by extension), PNG if unknown."""
+        fmt = fmt or _format_for(self.filename)
+        with self._lock:
+            if fmt not in self._encoded:
+                buffered = BytesIO()
+                self.thumbnail.save(buffered, format=fmt)
+                self._encoded[fmt] = buffered.getvalue()
+            return self._encoded[fmt]
+
+    def preview_base64(self) -> str:
+        return base64.b64encode(self.thumbnail_bytes("JPEG")).decode("utf-8")
+
+    def save_thumbnail(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.thumbnail_bytes(_format_for(path)))
+
+
+def _format_for(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}.get(ext, "PNG")
+
+
+def build_artifacts(source, filename: str, thumb_size=THUMB_SIZE, model_size=MODEL_SIZE) -> ImageArtifacts:
+    """Decode `source` once at thumbnail scale and derive every artifact from it."""
+    thumbnail = optimize_image(source, size=thumb_size)
+    return ImageArtifacts(filename, thumbnail, model_size=model_size)
@@ -1,14 +1,109 @@
-from PIL import Image
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-def optimize_image(image_path: str, size=(224, 224)) -> Image.Image:
+from PIL import Image, ImageOps
+
+
+def fast_decode_enabled() -> bool:
+    return os.getenv("MATCHMAX_FAST_DECODE", "1") != "0"
+
+
+def optimize_image(image_path: str, size=(224, 224), fast=None) -> Image.Image:
     '''
     Resize image for CLIP model input while maintaining aspect ratio.
     Converts to RGB and applies high-quality antialiasing.
+    With `fast` (default, see MATCHMAX_FAST_DECODE) JPEGs are decoded directly
+    at a reduced scale near the target size and EXIF orientation is applied.
     '''
+    if fast is None:
+        fast = fast_decode_enabled()
     try:
+        if fast:
+            return _decode_reduced(image_path, size)
         image = Image.open(image_path).convert("RGB")
         optimized_image = image.copy()
         optimized_image.thumbnail(size, Image.LANCZOS)
         return optimized_image
     except Exception as e:
         raise RuntimeError(f"Failed to process image '{image_path}': {e}")
+
+
+def _decode_reduced(image_path, size) -> Image.Image:
+    image = Image.open(image_path)
+    # JPEG draft mode lets libjpeg decode at 1/2, 1/4 or 1/8 scale — no full-resolution bitmap.
+    # Request the larger side for both dims so a 90° EXIF rotation still covers the target.
+    edge = max(size)
+    image.draft("RGB", (edge, edge))
+    image = ImageOps.exif_transpose(image)
+    # Palette / bilevel / alpha modes must become RGB first: resizing in palette space
+    # silently degrades LANCZOS to NEAREST. RGB, L and CMYK resample fine and convert after.
+    if image.mode not in ("RGB", "L", "CMYK"):
+        image = image.convert("RGB")
+    # reducing_gap box-reduces non-JPEG inputs before the final LANCZOS pass
+    image.thumbnail(size, Image.LANCZOS, reducing_gap=3.0)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+# ---------- Decode profiling ---------------------------------------------- #
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+
+
+def profile_decode(image_path: str, size=(224, 224), fast=True) -> dict:
+    """Decode one image and report CPU time, wall time and the process peak RSS."""
+    rss_before = _peak_rss_mb()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    image = optimize_image(image_path, size=size, fast=fast)
+    cpu_ms = (time.process_time() - cpu_start) * 1000
+    wall_ms = (time.perf_counter() - wall_start) * 1000
+    peak = _peak_rss_mb()
+    return {
+        "image": os.path.basename(image_path),
+        "mode": "fast" if fast else "full",
+        "output_size": image.size,
+        "cpu_ms": round(cpu_ms, 2),
+        "wall_ms": round(wall_ms, 2),
+        "peak_rss_mb": round(peak, 1),
+        "peak_rss_growth_mb": round(peak - rss_before, 1),
+    }
+
+
+def _profile_many(image_paths, size, fast):
+    return [profile_decode(p, size=size, fast=fast) for p in image_paths]
+
+
+def compare_decode_paths(image_paths, size=(224, 224)) -> dict:
+    """
+    Profile the full-resolution and reduced decode paths side by side.
+    Each mode runs in its own child process so peak RSS figures don't bleed into each other.
+    """
+    report = {}
+    for fast in (False, True):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            rows = pool.submit(_profile_many, list(image_paths), size, fast).result()
+        report["fast" if fast else "full"] = {
+            "images": rows,
+            "total_cpu_ms": round(sum(r["cpu_ms"] for r in rows), 2),
+            "peak_rss_mb": max((r["peak_rss_mb"] for r in rows), default=0.0),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m tools.image_optim_tool <image> [<image> ...]")
+        sys.exit(1)
+
+    results = compare_decode_paths(sys.argv[1:])
+    for mode, summary in results.items():
+        print(f"\n🖼️  {mode} decode — total CPU {summary['total_cpu_ms']} ms, peak RSS {summary['peak_rss_mb']} MB")
+        for row in summary["images"]:
+            print(f"   {row['image']}: {row['cpu_ms']} ms CPU, +{row['peak_rss_growth_mb']} MB RSS → {row['output_size']}")
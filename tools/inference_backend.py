@@ -0,0 +1,326 @@
+# tools/inference_backend.py
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+
+import torch
+import transformers
+from transformers.modeling_outputs import BaseModelOutputWithPooling
+
+BACKENDS = ("fp32", "bf16", "int8", "onnx")
+ONNX_DIR = "data/cache/onnx"
+ONNX_OPSET = 17
+
+
+def selected_backend() -> str:
+    backend = os.getenv("MATCHMAX_INFERENCE_BACKEND", "fp32").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    return backend
+
+
+def inference_context(model):
+    """
+    Context for every forward pass: inference_mode always, plus bf16 autocast
+    when the model was prepared with the bf16 backend.
+    """
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if getattr(model, "_matchmax_backend", "fp32") == "bf16":
+        device_type = "cuda" if str(getattr(model, "device", "cpu")).startswith("cuda") else "cpu"
+        stack.enter_context(torch.autocast(device_type=device_type, dtype=torch.bfloat16))
+    return stack
+
+
+# ---------- Backend preparation ------------------------------------------- #
+
+def _onnx_supported(device) -> bool:
+    if device != "cpu":
+        print(f"⚠️  The onnx backend targets CPU boxes; keeping torch fp32 on {device}")
+        return False
+    return True
+
+
+def prepare_clip(model, name: str, backend: str, device: str):
+    if backend == "onnx" and _onnx_supported(device):
+        model = OnnxClipModel.from_torch(model, name)
+    else:
+        model = _prepare_torch(model, backend, device)
+    model._matchmax_backend = backend
+    return model
+
+
+def prepare_blip(model, name: str, backend: str, device: str):
+    if backend == "onnx" and _onnx_supported(device):
+        # Only the ViT encoder is exported; the text decoder stays in torch for beam search
+        model.vision_model = OnnxBlipVision.from_torch(model, name)
+    else:
+        model = _prepare_torch(model, backend, device)
+    model._matchmax_backend = backend
+    return model
+
+
+def _prepare_torch(model, backend, device):
+    if backend == "int8":
+        if device != "cpu":
+            print(f"⚠️  int8 dynamic quantization is CPU-only; keeping fp32 on {device}")
+            return model
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+# ---------- ONNX Runtime wrappers ----------------------------------------- #
+
+def _ort_session(path):
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("The 'onnx' backend needs onnxruntime: pip install onnxruntime")
+    options = ort.SessionOptions()
+    threads = os.getenv("MATCHMAX_TORCH_THREADS")
+    if threads:
+        options.intra_op_num_threads = int(threads)
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def _onnx_path(name, part, input_names, dynamic_axes, example_args):
+    """
+    Graph file for one exported part. The file name carries a fingerprint of the
+    torch / transformers versions, the opset and the export settings, so an
+    upgrade or a settings change exports a fresh graph instead of reusing a stale one.
+    """
+    settings = {
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "opset": ONNX_OPSET,
+        "input_names": input_names,
+        "dynamic_axes": dynamic_axes,
+        "example_shapes": [list(a.shape) for a in example_args],
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    folder = os.path.join(ONNX_DIR, name.replace("/", "__"))
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{part}-{digest}.onnx")
+
+
+def _export(module, args, name, part, input_names, dynamic_axes) -> str:
+    path = _onnx_path(name, part, input_names, dynamic_axes, args)
+    if os.path.exists(path):
+        return path
+    print(f"📦 Exporting ONNX graph to {path}")
+    module.eval()
+    # no_grad, not inference_mode: tracing can fail on inference tensors
+    with torch.no_grad():
+        torch.onnx.export(
+            module, args, path,
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+        )
+    return path
+
+
+class _ClipVisionTower(torch.nn.Module):
+    def __init__(self, clip):
+        super().__init__()
+        self.clip = clip
+
+    def forward(self, pixel_values):
+        return self.clip.get_image_features(pixel_values=pixel_values)
+
+
+class _ClipTextTower(torch.nn.Module):
+    def __init__(self, clip):
+        super().__init__()
+        self.clip = clip
+
+    def forward(self, input_ids, attention_mask):
+        return self.clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+
+class _BlipVisionEncoder(torch.nn.Module):
+    def __init__(self, blip):
+        super().__init__()
+        self.vision = blip.vision_model
+
+    def forward(self, pixel_values):
+        return self.vision(pixel_values=pixel_values)[0]
+
+
+class OnnxClipModel(torch.nn.Module):
+    """Drop-in for the parts of CLIPModel the scorers use: both towers run in ONNX Runtime."""
+
+    def __init__(self, vision_session, text_session, logit_scale, onnx_paths=()):
+        super().__init__()
+        self.vision_session = vision_session
+        self.text_session = text_session
+        self.logit_scale = torch.nn.Parameter(logit_scale.detach().clone(), requires_grad=False)
+        # The weights live in these files, not in torch parameters; the registry sizes them from disk
+        self.onnx_paths = tuple(onnx_paths)
+
+    @classmethod
+    def from_torch(cls, clip, name):
+        image_size = clip.config.vision_config.image_size
+        vision_path = _export(
+            _ClipVisionTower(clip).cpu(),
+            (torch.zeros(1, 3, image_size, image_size),),
+            name, "clip_vision", ["pixel_values"], {"pixel_values": {0: "batch"}, "output": {0: "batch"}},
+        )
+        text_path = _export(
+            _ClipTextTower(clip).cpu(),
+            (torch.ones(1, 8, dtype=torch.long), torch.ones(1, 8, dtype=torch.long)),
+            name, "clip_text", ["input_ids", "attention_mask"],
+            {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}, "output": {0: "batch"}},
+        )
+        return cls(_ort_session(vision_path), _ort_session(text_path), clip.logit_scale.cpu(),
+                   onnx_paths=(vision_path, text_path))
+
+    def get_image_features(self, pixel_values, **_):
+        out = self.vision_session.run(None, {"pixel_values": pixel_values.cpu().float().numpy()})[0]
+        return torch.from_numpy(out)
+
+    def get_text_features(self, input_ids, attention_mask=None, **_):
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        out = self.text_session.run(None, {
+            "input_ids": input_ids.cpu().numpy(),
+            "attention_mask": attention_mask.cpu().numpy(),
+        })[0]
+        return torch.from_numpy(out)
+
+
+class OnnxBlipVision(torch.nn.Module):
+    """Replaces BlipForConditionalGeneration.vision_model with an ONNX Runtime session."""
+
+    def __init__(self, session, onnx_paths=()):
+        super().__init__()
+        self.session = session
+        self.onnx_paths = tuple(onnx_paths)
+
+    @classmethod
+    def from_torch(cls, blip, name):
+        image_size = blip.config.vision_config.image_size
+        path = _export(
+            _BlipVisionEncoder(blip).cpu(),
+            (torch.zeros(1, 3, image_size, image_size),),
+            name, "blip_vision", ["pixel_values"], {"pixel_values": {0: "batch"}, "output": {0: "batch"}},
+        )
+        return cls(_ort_session(path), onnx_paths=(path,))
+
+    def forward(self, pixel_values=None, **_):
+        hidden = torch.from_numpy(
+            self.session.run(None, {"pixel_values": pixel_values.cpu().float().numpy()})[0]
+        )
+        return BaseModelOutputWithPooling(last_hidden_state=hidden, pooler_output=hidden[:, 0, :])
+
+
+# ---------- Accuracy check against fp32 ----------------------------------- #
+
+def _kendall_tau(a, b) -> float:
+    n = len(a)
+    if n < 2:
+        return 1.0
+    concordant = discordant = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            s = (a[i] - a[j]) * (b[i] - b[j])
+            if s > 0:
+                concordant += 1
+            elif s < 0:
+                discordant += 1
+    pairs = n * (n - 1) / 2
+    return round((concordant - discordant) / pairs, 3)
+
+
+def _token_overlap(a: str, b: str) -> float:
+    ta, tb = set(a.lower().split()), set(b.lower().split())
+    if not ta and not tb:
+        return 1.0
+    return round(len(ta & tb) / len(ta | tb), 3)
+
+
+def _run_backend(image_paths, backend, device, reference_captions=None):
+    from tools.image_optim_tool import optimize_image
+    from tools.model_registry import get_model_registry
+    from tools.vision_tool import encode_images, encode_texts, logit_scale
+
+    from tools.photo_scoring import NEGATIVE_PROMPTS as negatives
+
+    registry = get_model_registry()
+    clip, clip_processor = registry.get_clip(device=device, backend=backend)
+    blip, blip_processor = registry.get_blip(device=device, backend=backend)
+    images = [optimize_image(p) for p in image_paths]
+
+    start = time.perf_counter()
+    inputs = blip_processor(images=images, text=[""] * len(images), return_tensors="pt", padding=True).to(device)
+    with inference_context(blip):
+        out_ids = blip.generate(**inputs, max_new_tokens=80, num_beams=5, length_penalty=1.2, early_stopping=True)
+    captions = [blip_processor.decode(ids, skip_special_tokens=True).strip().capitalize() for ids in out_ids]
+    caption_seconds = time.perf_counter() - start
+
+    # Score against the same captions for every backend so only CLIP drift shows up
+    texts = reference_captions or captions
+    start = time.perf_counter()
+    image_embeds = encode_images(clip, clip_processor, images, device).float()
+    caption_embeds = encode_texts(clip, clip_processor, texts, device).float()
+    negative_embeds = encode_texts(clip, clip_processor, negatives, device).float()
+    scale = logit_scale(clip)
+    pos = scale * (image_embeds * caption_embeds).sum(dim=-1, keepdim=True)
+    neg = scale * image_embeds @ negative_embeds.T
+    scores = (torch.cat([pos, neg], dim=1).softmax(dim=1)[:, 0] * 100).tolist()
+    score_seconds = time.perf_counter() - start
+
+    return {
+        "captions": captions,
+        "scores": [round(s, 2) for s in scores],
+        "caption_seconds": round(caption_seconds, 3),
+        "score_seconds": round(score_seconds, 3),
+    }
+
+
+def compare_to_baseline(image_paths, backend: str, device="cpu") -> dict:
+    """
+    Caption and score the same images with fp32 and `backend`; report speedup,
+    score drift, ranking agreement (Kendall tau, top-1) and caption overlap.
+    """
+    baseline = _run_backend(image_paths, "fp32", device)
+    candidate = _run_backend(image_paths, backend, device, reference_captions=baseline["captions"])
+
+    diffs = [abs(a - b) for a, b in zip(baseline["scores"], candidate["scores"])]
+    overlaps = [_token_overlap(a, b) for a, b in zip(baseline["captions"], candidate["captions"])]
+    top_base = max(range(len(diffs)), key=lambda i: baseline["scores"][i]) if diffs else None
+    top_cand = max(range(len(diffs)), key=lambda i: candidate["scores"][i]) if diffs else None
+
+    return {
+        "backend": backend,
+        "images": len(image_paths),
+        "speedup_caption": round(baseline["caption_seconds"] / max(candidate["caption_seconds"], 1e-9), 2),
+        "speedup_score": round(baseline["score_seconds"] / max(candidate["score_seconds"], 1e-9), 2),
+        "score_mean_abs_diff": round(sum(diffs) / len(diffs), 3) if diffs else 0.0,
+        "score_max_abs_diff": round(max(diffs), 3) if diffs else 0.0,
+        "ranking_kendall_tau": _kendall_tau(baseline["scores"], candidate["scores"]),
+        "top1_agrees": top_base == top_cand,
+        "caption_exact_match": round(
+            sum(a == b for a, b in zip(baseline["captions"], candidate["captions"])) / max(len(overlaps), 1), 3
+        ),
+        "caption_token_overlap": round(sum(overlaps) / len(overlaps), 3) if overlaps else 0.0,
+        "baseline": baseline,
+        "candidate": candidate,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in BACKENDS:
+        print(f"Usage: python -m tools.inference_backend <{'|'.join(BACKENDS)}> <image> [<image> ...]")
+        sys.exit(1)
+
+    report = compare_to_baseline(sys.argv[2:], sys.argv[1])
+    print(f"\n⚙️  Backend {report['backend']} vs fp32 on {report['images']} images")
+    print(f"   Caption speedup: {report['speedup_caption']}x, score speedup: {report['speedup_score']}x")
+    print(f"   Score drift: mean {report['score_mean_abs_diff']}, max {report['score_max_abs_diff']}")
+    print(f"   Ranking Kendall tau: {report['ranking_kendall_tau']}, top-1 agrees: {report['top1_agrees']}")
+    print(f"   Captions exact match: {report['caption_exact_match']}, token overlap: {report['caption_token_overlap']}")
@@ -0,0 +1,188 @@
+# tools/inference_executor.py
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import torch
+
+
+class InferenceQueueFull(RuntimeError):
+    pass
+
+
+class InferenceExecutor:
+    """
+    App-wide worker pool for model inference and image decoding.
+    Replaces per-call ThreadPoolExecutor()s: a fixed worker count, an explicit
+    torch intra-op / inter-op thread budget, and a bounded admission queue so
+    work beyond `max_pending` waits (up to `admission_timeout`) or is rejected.
+    """
+
+    def __init__(self, max_workers=4, intra_op_threads=None, inter_op_threads=1,
+                 max_pending=32, admission_timeout=10.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.admission_timeout = admission_timeout
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // 2)
+        self.inter_op_threads = inter_op_threads
+        self._configure_torch()
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        # Admission slots; waiters are handed a freed slot in FIFO order through their Future
+        self._admission_lock = threading.Lock()
+        self._free_slots = max_pending
+        self._waiters = deque()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._totals = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+                        "admission_wait_s": 0.0}
+
+    def _configure_torch(self):
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.inter_op_threads)
+        except RuntimeError:
+            # Can only be set once, before any inter-op work has started
+            print("⚠️  torch inter-op threads already initialised; keeping existing setting")
+
+    # ---------- Public API -------------------------------------------------- #
+
+    def submit(self, fn, *args):
+        """Blocking admission, for sync callers. Returns a concurrent.futures.Future."""
+        start = time.perf_counter()
+        waiter = self._acquire_slot()
+        if waiter is not None:
+            try:
+                waiter.result(timeout=self.admission_timeout)
+            except FutureTimeoutError:
+                self._abandon(waiter)
+        return self._dispatch(fn, args, time.perf_counter() - start)
+
+    async def run(self, fn, *args):
+        """Async admission: awaits a freed slot without blocking (or polling on) the event loop."""
+        start = time.perf_counter()
+        waiter = self._acquire_slot()
+        if waiter is not None:
+            # asyncio.wait rather than wait_for: a timeout must not cancel a slot handed over meanwhile
+            try:
+                done, _ = await asyncio.wait({asyncio.wrap_future(waiter)}, timeout=self.admission_timeout)
+            except asyncio.CancelledError:
+                self._withdraw(waiter)
+                raise
+            if not done:
+                self._abandon(waiter)
+        future = self._dispatch(fn, args, time.perf_counter() - start)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            totals = dict(self._totals)
+            in_flight = self._in_flight
+        waited = totals.pop("admission_wait_s")
+        submitted = totals["submitted"]
+        totals["avg_admission_wait_ms"] = round(waited / submitted * 1000, 2) if submitted else 0.0
+        totals.update({
+            "in_flight": in_flight,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "torch_intra_op_threads": self.intra_op_threads,
+            "torch_inter_op_threads": self.inter_op_threads,
+        })
+        return totals
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    # ---------- Internal helpers ------------------------------------------- #
+
+    def _acquire_slot(self):
+        """None when a slot was free, else a Future resolved once a slot is handed over."""
+        with self._admission_lock:
+            if self._free_slots and not self._waiters:
+                self._free_slots -= 1
+                return None
+            waiter = Future()
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter: Future):
+        # cancel() fails only if a slot was handed over in the meantime; then keep it
+        if waiter.cancel():
+            self._reject()
+
+    def _withdraw(self, waiter: Future):
+        # The caller went away: drop out of the queue, or pass on a slot that was already handed over
+        if not waiter.cancel():
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._admission_lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(True)
+                    return
+            self._free_slots += 1
+
+    def _reject(self):
+        with self._stats_lock:
+            self._totals["rejected"] += 1
+        raise InferenceQueueFull(
+            f"Inference queue full ({self.max_pending} pending), try again shortly"
+        )
+
+    def _dispatch(self, fn, args, waited):
+        with self._stats_lock:
+            self._in_flight += 1
+            self._totals["submitted"] += 1
+            self._totals["admission_wait_s"] += waited
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        self._release_slot()
+        with self._stats_lock:
+            self._in_flight -= 1
+            if future is None or future.cancelled() or future.exception() is not None:
+                self._totals["failed"] += 1
+            else:
+                self._totals["completed"] += 1
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> InferenceExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            threads = os.getenv("MATCHMAX_TORCH_THREADS")
+            _executor = InferenceExecutor(
+                max_workers=int(os.getenv("MATCHMAX_INFERENCE_WORKERS", "4")),
+                intra_op_threads=int(threads) if threads else None,
+                inter_op_threads=int(os.getenv("MATCHMAX_TORCH_INTEROP_THREADS", "1")),
+                max_pending=int(os.getenv("MATCHMAX_INFERENCE_MAX_PENDING", "32")),
+                admission_timeout=float(os.getenv("MATCHMAX_INFERENCE_ADMISSION_TIMEOUT", "10")),
+            )
+        return _executor
+
+
+def inference_executor_stats() -> dict:
+    return _executor.stats() if _executor is not None else {}
+
+
+def shutdown_inference_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
@@ -0,0 +1,128 @@
+# tools/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def request_key(model: str, messages: list, **params) -> str:
+    """Stable hash of everything that determines a completion."""
+    blob = json.dumps(
+        {"model": model, "messages": messages, **params},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Local SQLite store of chat completion responses with a TTL and LRU size limit.
+    Call sites opt in per call; hit rate and tokens saved are tracked.
+    """
+
+    def __init__(self, db_path="data/cache/llm_responses.sqlite3", ttl_seconds=86400, max_entries=10000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                total_tokens INTEGER,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_last_access ON llm_responses(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, total_tokens, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, total_tokens, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            self.tokens_saved += total_tokens or 0
+        return response
+
+    def put(self, key: str, model: str, response: str, total_tokens: int = 0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_responses (key, model, response, total_tokens, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, model, response, total_tokens, now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM llm_responses WHERE key IN (
+                        SELECT key FROM llm_responses ORDER BY last_access ASC LIMIT ?
+                    )
+                    """,
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def build_llm_cache():
+    if os.getenv("MATCHMAX_LLM_CACHE", "1") == "0":
+        return None
+    return LLMResponseCache(
+        db_path=os.getenv("MATCHMAX_LLM_CACHE_PATH", "data/cache/llm_responses.sqlite3"),
+        ttl_seconds=float(os.getenv("MATCHMAX_LLM_CACHE_TTL", "86400")),
+        max_entries=int(os.getenv("MATCHMAX_LLM_CACHE_MAX_ENTRIES", "10000")),
+    )
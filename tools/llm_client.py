@@ -0,0 +1,299 @@
+# tools/llm_client.py
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletion
+
+from tools.llm_cache import build_llm_cache, request_key
+from tools.llm_scheduler import build_llm_scheduler
+
+load_dotenv()
+
+
+class LLMStats:
+    """Per-model latency and HTTP connection-reuse counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = defaultdict(lambda: {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        self._connections = {"requests": 0, "new_connections": 0}
+        self._seen_streams = set()
+
+    def record_call(self, model, elapsed_ms, ok=True):
+        with self._lock:
+            m = self._models[model]
+            m["calls"] += 1
+            m["errors"] += 0 if ok else 1
+            m["total_ms"] += elapsed_ms
+            m["max_ms"] = max(m["max_ms"], elapsed_ms)
+
+    def record_response(self, response):
+        # httpcore exposes the underlying network stream; a new id means a fresh TCP/TLS connection
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self._connections["requests"] += 1
+            if len(self._seen_streams) > 10000:
+                self._seen_streams.clear()
+            if stream is not None and id(stream) not in self._seen_streams:
+                self._seen_streams.add(id(stream))
+                self._connections["new_connections"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            models = {
+                name: {
+                    "calls": m["calls"],
+                    "errors": m["errors"],
+                    "avg_ms": round(m["total_ms"] / m["calls"], 1) if m["calls"] else 0.0,
+                    "max_ms": round(m["max_ms"], 1),
+                }
+                for name, m in self._models.items()
+            }
+            conns = dict(self._connections)
+        reused = conns["requests"] - conns["new_connections"]
+        conns["reused_connections"] = reused
+        conns["reuse_rate"] = round(reused / conns["requests"], 3) if conns["requests"] else 0.0
+        return {"models": models, "connections": conns}
+
+
+class LLMClient:
+    """
+    Shared OpenAI client for every agent and tool.
+    One pooled httpx client keeps connections (and TLS sessions) alive across calls.
+    Point MATCHMAX_LLM_BASE_URL at a local stand-in server for testing.
+    Pass cache=True on a call to serve repeats from the local response cache.
+    With a scheduler, calls respect per-model RPM/TPM limits and priority lanes,
+    and the scheduler retries 429s and transient failures (connection errors,
+    timeouts, 408/409, 5xx) itself, so the SDK's own retries are disabled.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_connections=20,
+                 max_keepalive=10, keepalive_expiry=60.0, timeout=60.0, connect_timeout=5.0,
+                 response_cache=None, scheduler=None):
+        self.stats = LLMStats()
+        self.response_cache = response_cache
+        self.scheduler = scheduler
+        self._sdk_retries = 0 if scheduler is not None else 2
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+
+        self.http_client = httpx.Client(
+            limits=self._limits,
+            timeout=self._timeout,
+            event_hooks={"response": [self.stats.record_response]},
+        )
+        self.client = OpenAI(
+            api_key=self.api_key, base_url=base_url, http_client=self.http_client, max_retries=self._sdk_retries
+        )
+
+        # Async pools are bound to the event loop they were created on (uvicorn's loop in the API),
+        # so there is one per live loop: {loop: (httpx.AsyncClient, AsyncOpenAI, closer task)}
+        self._async_clients = {}
+        self._async_lock = threading.Lock()
+
+    def _cached(self, cache, model, messages, kwargs):
+        if not cache or self.response_cache is None:
+            return None, None
+        key = request_key(model, messages, **kwargs)
+        hit = self.response_cache.get(key)
+        return key, (ChatCompletion.model_validate_json(hit) if hit is not None else None)
+
+    def _store(self, key, model, response):
+        if key is None:
+            return
+        usage = getattr(response, "usage", None)
+        try:
+            self.response_cache.put(key, model, response.model_dump_json(), getattr(usage, "total_tokens", 0) or 0)
+        except Exception as e:
+            print(f"⚠️  LLM cache write failed: {e}")
+
+    def chat(self, model: str, messages: list, cache: bool = False, **kwargs):
+        """chat.completions.create with latency accounting. Returns the raw response."""
+        key, hit = self._cached(cache, model, messages, kwargs)
+        if hit is not None:
+            return hit
+
+        def call():
+            start = time.perf_counter()
+            ok = False
+            try:
+                response = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+                ok = True
+                return response
+            finally:
+                self.stats.record_call(model, (time.perf_counter() - start) * 1000, ok)
+
+        if self.scheduler is not None:
+            response = self.scheduler.run(model, messages, kwargs, call)
+        else:
+            response = call()
+        self._store(key, model, response)
+        return response
+
+    def complete(self, model: str, messages: list, **kwargs) -> str:
+        """Convenience: first choice's text, stripped."""
+        return self.chat(model, messages, **kwargs).choices[0].message.content.strip()
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            entry = self._async_clients.get(loop)
+            if entry is None:
+                async def record_response(response):
+                    self.stats.record_response(response)
+
+                http_client = httpx.AsyncClient(
+                    limits=self._limits,
+                    timeout=self._timeout,
+                    event_hooks={"response": [record_response]},
+                )
+                aclient = AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, http_client=http_client,
+                    max_retries=self._sdk_retries
+                )
+                closer = loop.create_task(self._close_with_loop(loop))
+                entry = self._async_clients[loop] = (http_client, aclient, closer)
+        return entry[1]
+
+    async def _close_with_loop(self, loop):
+        """
+        Parked for the lifetime of the loop. asyncio.run cancels leftover tasks
+        before closing its loop, so each CLI / workflow run closes its own pool
+        here even when nobody calls aclose().
+        """
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self._release_async_client(loop)
+
+    async def _release_async_client(self, loop):
+        # Whoever removes the entry closes the pool, so it is closed exactly once
+        with self._async_lock:
+            entry = self._async_clients.pop(loop, None)
+        if entry is not None:
+            await entry[0].aclose()
+
+    async def achat(self, model: str, messages: list, cache: bool = False, **kwargs):
+        """Async chat.completions.create — keeps the event loop free during the round-trip."""
+        use_cache = cache and self.response_cache is not None
+        # SQLite lookups and writes block; they run in a worker thread, never on the loop
+        key, hit = await asyncio.to_thread(self._cached, cache, model, messages, kwargs) if use_cache else (None, None)
+        if hit is not None:
+            return hit
+
+        async def call():
+            start = time.perf_counter()
+            ok = False
+            try:
+                response = await self.aclient.chat.completions.create(model=model, messages=messages, **kwargs)
+                ok = True
+                return response
+            finally:
+                self.stats.record_call(model, (time.perf_counter() - start) * 1000, ok)
+
+        if self.scheduler is not None:
+            response = await self.scheduler.arun(model, messages, kwargs, call)
+        else:
+            response = await call()
+        if key is not None:
+            await asyncio.to_thread(self._store, key, model, response)
+        return response
+
+    async def acomplete(self, model: str, messages: list, **kwargs) -> str:
+        return (await self.achat(model, messages, **kwargs)).choices[0].message.content.strip()
+
+    async def astream(self, model: str, messages: list, cache: bool = False, **kwargs):
+        """Async generator of text deltas as the model produces them. Streams are never cached."""
+        async def call():
+            # Only opening the stream is retried; a 429 always arrives before the first token
+            return await self.aclient.chat.completions.create(
+                model=model, messages=messages, stream=True, **kwargs
+            )
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            if self.scheduler is not None:
+                stream = await self.scheduler.arun(model, messages, kwargs, call)
+            else:
+                stream = await call()
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            ok = True
+        finally:
+            self.stats.record_call(model, (time.perf_counter() - start) * 1000, ok)
+
+    async def aclose(self):
+        """Close the pool bound to the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            entry = self._async_clients.get(loop)
+        if entry is not None:
+            entry[2].cancel()
+        await self._release_async_client(loop)
+
+    def close(self):
+        self.http_client.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                base_url=os.getenv("MATCHMAX_LLM_BASE_URL") or None,
+                max_connections=int(os.getenv("MATCHMAX_LLM_MAX_CONNECTIONS", "20")),
+                max_keepalive=int(os.getenv("MATCHMAX_LLM_MAX_KEEPALIVE", "10")),
+                keepalive_expiry=float(os.getenv("MATCHMAX_LLM_KEEPALIVE_EXPIRY", "60")),
+                timeout=float(os.getenv("MATCHMAX_LLM_TIMEOUT", "60")),
+                connect_timeout=float(os.getenv("MATCHMAX_LLM_CONNECT_TIMEOUT", "5")),
+                response_cache=build_llm_cache(),
+                scheduler=build_llm_scheduler(),
+            )
+        return _client
+
+
+def llm_client_stats() -> dict:
+    if _client is None:
+        return {}
+    stats = _client.stats.snapshot()
+    if _client.response_cache is not None:
+        stats["response_cache"] = _client.response_cache.stats()
+    if _client.scheduler is not None:
+        stats["scheduler"] = _client.scheduler.stats()
+    return stats
+
+
+async def aclose_llm_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+        client.close()
+
+
+def close_llm_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,382 @@
+# tools/llm_scheduler.py
+import asyncio
+import contextlib
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, InternalServerError, RateLimitError
+
+LANES = ("interactive", "batch")
+
+
+class LLMAdmissionTimeout(RuntimeError):
+    pass
+
+# Lane of the current request; tasks and to_thread calls inherit it from their creator
+_lane = contextvars.ContextVar("matchmax_llm_lane", default="interactive")
+
+
+def set_llm_priority(lane: str):
+    """Set the lane for the current task / thread context (e.g. at the top of a batch worker)."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown LLM priority lane {lane!r} (expected one of {LANES})")
+    return _lane.set(lane)
+
+
+@contextlib.contextmanager
+def llm_priority(lane: str):
+    token = set_llm_priority(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+def estimate_tokens(messages: list, max_tokens=None, n=1, default_completion=300) -> int:
+    """Rough pre-call estimate (≈4 characters per token) used to debit the TPM bucket."""
+    prompt = sum(len(str(m.get("content", ""))) for m in messages) // 4 + 4 * len(messages)
+    return prompt + (max_tokens or default_completion) * (n or 1)
+
+
+class TokenBucket:
+    """Continuous-refill bucket: `capacity` units, refilled at capacity per `period` seconds."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float, floor: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while keeping `floor` units in the bucket."""
+        missing = amount + floor - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+
+class _ModelState:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.waiting = {lane: 0 for lane in LANES}
+
+
+class LLMScheduler:
+    """
+    Admission control for every OpenAI call of the process.
+    Per-model token buckets enforce requests-per-minute and tokens-per-minute
+    (debited with an estimate up front, settled with the reported usage).
+    Interactive calls go first: batch calls wait while any interactive call
+    for the same model is queued, and leave `interactive_reserve` of each
+    bucket untouched. 429s are retried with jittered exponential backoff,
+    honouring Retry-After, and pause the whole model while backing off.
+    Transient failures (connection errors, timeouts, 408/409, 5xx) are retried
+    with the same backoff but only delay their own call; 429s for an exhausted
+    quota ("insufficient_quota") fail at once, since waiting cannot fix them.
+    """
+
+    def __init__(self, default_rpm=500, default_tpm=30000, model_limits=None, max_retries=5,
+                 base_backoff=0.5, max_backoff=30.0, interactive_reserve=0.2, enabled=True,
+                 admission_timeout=300.0):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.model_limits = dict(model_limits or {})
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.interactive_reserve = interactive_reserve
+        self.enabled = enabled
+        # Longest a call may queue for capacity before LLMAdmissionTimeout
+        self.admission_timeout = admission_timeout
+
+        self._lock = threading.Lock()
+        self._models = {}
+        self._lanes = defaultdict(lambda: {"admitted": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0})
+        self._counters = defaultdict(lambda: {
+            "rate_limited": 0, "transient_errors": 0, "retries": 0, "failed": 0, "admission_timeouts": 0,
+            "estimated_tokens": 0, "used_tokens": 0,
+        })
+
+    # ---------- admission ------------------------------------------------- #
+
+    def _state(self, model) -> _ModelState:
+        if model not in self._models:
+            rpm, tpm = self.model_limits.get(model, (self.default_rpm, self.default_tpm))
+            self._models[model] = _ModelState(rpm, tpm)
+        return self._models[model]
+
+    def _floors(self, state, lane):
+        """Capacity a lane must leave in the buckets: batch keeps the interactive reserve free."""
+        if lane != "batch":
+            return 0.0, 0.0
+        # Never so high that one request could not fit at all
+        request_floor = min(self.interactive_reserve * state.requests.capacity, max(0.0, state.requests.capacity - 1))
+        token_floor = self.interactive_reserve * state.tokens.capacity
+        return request_floor, token_floor
+
+    def fit_estimate(self, model, tokens, lane=None) -> int:
+        """
+        Cap an estimate at what `lane` can ever be admitted with; larger ones would wait forever.
+        The same capped figure is debited, settled and refunded.
+        """
+        lane = lane or current_lane()
+        with self._lock:
+            state = self._state(model)
+            _, token_floor = self._floors(state, lane)
+            return int(max(1, min(tokens, state.tokens.capacity - token_floor)))
+
+    def _try_admit(self, model, tokens, lane) -> float:
+        """Take capacity and return 0, or return how long to wait before trying again."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            if now < state.blocked_until:
+                return state.blocked_until - now
+            state.requests.refill(now)
+            state.tokens.refill(now)
+            if lane == "batch" and state.waiting["interactive"]:
+                return 0.05
+            request_floor, token_floor = self._floors(state, lane)
+            tokens = min(tokens, state.tokens.capacity - token_floor)
+
+            wait = max(state.requests.wait_for(1, request_floor), state.tokens.wait_for(tokens, token_floor))
+            if wait > 0:
+                return wait
+            state.requests.level -= 1
+            state.tokens.level -= tokens
+            self._counters[model]["estimated_tokens"] += tokens
+            return 0.0
+
+    def _enter(self, model, lane):
+        with self._lock:
+            self._state(model).waiting[lane] += 1
+
+    def _leave(self, model, lane, started):
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._state(model).waiting[lane] -= 1
+            stats = self._lanes[lane]
+            stats["admitted"] += 1
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+    def _pause(self, model, wait, started) -> float:
+        """How long to sleep before the next admission attempt; raises once the deadline has passed."""
+        remaining = self.admission_timeout - (time.perf_counter() - started) if self.admission_timeout else float("inf")
+        if remaining <= 0:
+            with self._lock:
+                self._counters[model]["admission_timeouts"] += 1
+            raise LLMAdmissionTimeout(
+                f"No {model} capacity within {self.admission_timeout:g}s; the request was not sent"
+            )
+        return min(wait, 1.0, remaining)
+
+    def acquire(self, model, tokens, lane=None):
+        if not self.enabled:
+            return
+        lane = lane or current_lane()
+        started = time.perf_counter()
+        self._enter(model, lane)
+        try:
+            while (wait := self._try_admit(model, tokens, lane)) > 0:
+                time.sleep(self._pause(model, wait, started))
+        finally:
+            self._leave(model, lane, started)
+
+    async def aacquire(self, model, tokens, lane=None):
+        if not self.enabled:
+            return
+        lane = lane or current_lane()
+        started = time.perf_counter()
+        self._enter(model, lane)
+        try:
+            while (wait := self._try_admit(model, tokens, lane)) > 0:
+                await asyncio.sleep(self._pause(model, wait, started))
+        finally:
+            self._leave(model, lane, started)
+
+    def settle(self, model, estimated, response):
+        """Correct the TPM bucket with the usage the API actually reported."""
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        if used is None:
+            return
+        with self._lock:
+            state = self._state(model)
+            state.tokens.level = min(state.tokens.capacity, state.tokens.level + min(estimated, state.tokens.capacity) - used)
+            self._counters[model]["used_tokens"] += used
+
+    # ---------- retries --------------------------------------------------- #
+
+    def _retry_delay(self, model, attempt, error, estimated):
+        """Seconds to wait before retrying the failed call, or None to re-raise `error`."""
+        kind = _retry_kind(error)
+        if kind is None:
+            if isinstance(error, RateLimitError):
+                # Out of quota: counted, but retrying cannot help
+                with self._lock:
+                    self._counters[model]["rate_limited"] += 1
+                    self._counters[model]["failed"] += 1
+            return None
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        with self._lock:
+            state = self._state(model)
+            if _never_processed(error):
+                # A 429 or a failed connect consumed no tokens; give the estimate back.
+                # Timeouts and 5xx may have, so their estimate stays spent.
+                state.tokens.level = min(state.tokens.capacity, state.tokens.level + estimated)
+            counters = self._counters[model]
+            counters[kind] += 1
+            if attempt >= self.max_retries:
+                counters["failed"] += 1
+                return None
+            counters["retries"] += 1
+            if kind == "rate_limited":
+                # Everyone else on this model waits too instead of hammering the API
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def run(self, model, messages, kwargs, call):
+        """Blocking: admit, call, retry 429s and transient failures with backoff, settle usage."""
+        estimate = self.fit_estimate(model, estimate_tokens(messages, kwargs.get("max_tokens"), kwargs.get("n")))
+        for attempt in range(self.max_retries + 1):
+            self.acquire(model, estimate)
+            try:
+                response = call()
+            except Exception as e:
+                delay = self._retry_delay(model, attempt, e, estimate)
+                if delay is None:
+                    raise
+                print(f"⏳ {model} {_describe(e)}; retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+            self.settle(model, estimate, response)
+            return response
+
+    async def arun(self, model, messages, kwargs, call):
+        """Async `run`; `call` is a coroutine function."""
+        estimate = self.fit_estimate(model, estimate_tokens(messages, kwargs.get("max_tokens"), kwargs.get("n")))
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(model, estimate)
+            try:
+                response = await call()
+            except Exception as e:
+                delay = self._retry_delay(model, attempt, e, estimate)
+                if delay is None:
+                    raise
+                print(f"⏳ {model} {_describe(e)}; retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                continue
+            self.settle(model, estimate, response)
+            return response
+
+    # ---------- metrics --------------------------------------------------- #
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for name, state in self._models.items():
+                state.requests.refill(now)
+                state.tokens.refill(now)
+                models[name] = {
+                    "rpm_limit": int(state.requests.capacity),
+                    "tpm_limit": int(state.tokens.capacity),
+                    "requests_available": round(state.requests.level, 1),
+                    "tokens_available": round(state.tokens.level),
+                    "queued": dict(state.waiting),
+                    "backoff_remaining_s": round(max(0.0, state.blocked_until - now), 2),
+                    **self._counters[name],
+                }
+            lanes = {
+                lane: {
+                    "queued": sum(s.waiting[lane] for s in self._models.values()),
+                    "admitted": l["admitted"],
+                    "avg_wait_ms": round(l["total_wait_ms"] / l["admitted"], 1) if l["admitted"] else 0.0,
+                    "max_wait_ms": round(l["max_wait_ms"], 1),
+                }
+                for lane, l in ((lane, self._lanes[lane]) for lane in LANES)
+            }
+        return {"enabled": self.enabled, "lanes": lanes, "models": models}
+
+
+def _retry_kind(error):
+    """Counter for a retryable error: "rate_limited", "transient_errors", or None if retrying cannot help."""
+    if isinstance(error, RateLimitError):
+        return None if getattr(error, "code", None) == "insufficient_quota" else "rate_limited"
+    # APITimeoutError is an APIConnectionError; InternalServerError covers every 5xx
+    if isinstance(error, (APIConnectionError, InternalServerError)):
+        return "transient_errors"
+    if isinstance(error, APIStatusError) and error.status_code in (408, 409):
+        return "transient_errors"
+    return None
+
+
+def _never_processed(error) -> bool:
+    if isinstance(error, RateLimitError):
+        return True
+    return isinstance(error, APIConnectionError) and not isinstance(error, APITimeoutError)
+
+
+def _describe(error) -> str:
+    if isinstance(error, RateLimitError):
+        return "rate limited"
+    status = getattr(error, "status_code", None)
+    return f"failed ({type(error).__name__}{f' {status}' if status else ''})"
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        return seconds / 1000 if header.endswith("-ms") else seconds
+    return None
+
+
+def parse_model_limits(spec: str) -> dict:
+    """'gpt-4o=5000:800000,gpt-4=500:10000' → {model: (rpm, tpm)}."""
+    limits = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        model, _, values = part.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (int(rpm), int(tpm))
+    return limits
+
+
+def build_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        default_rpm=int(os.getenv("MATCHMAX_LLM_RPM", "500")),
+        default_tpm=int(os.getenv("MATCHMAX_LLM_TPM", "30000")),
+        model_limits=parse_model_limits(os.getenv("MATCHMAX_LLM_LIMITS", "")),
+        max_retries=int(os.getenv("MATCHMAX_LLM_MAX_RETRIES", "5")),
+        base_backoff=float(os.getenv("MATCHMAX_LLM_BACKOFF_BASE", "0.5")),
+        max_backoff=float(os.getenv("MATCHMAX_LLM_BACKOFF_MAX", "30")),
+        interactive_reserve=float(os.getenv("MATCHMAX_LLM_INTERACTIVE_RESERVE", "0.2")),
+        enabled=os.getenv("MATCHMAX_LLM_SCHEDULER", "1") != "0",
+        admission_timeout=float(os.getenv("MATCHMAX_LLM_ADMISSION_TIMEOUT", "300")),
+    )
@@ -0,0 +1,160 @@
+# tools/llm_stub_server.py
+"""
+Local stand-in for the OpenAI chat completions API, for load and integration testing.
+
+    python -m tools.llm_stub_server --port 8787 --latency-ms 300
+    python -m tools.llm_stub_server --rpm 60 --fail-rate 0.1 --retry-after 2   # inject 429s
+    MATCHMAX_LLM_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=stub uvicorn bio_api:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between calls
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    reply = "Coffee-fueled bookworm who travels for the food. Let's swap recommendations."
+    # 429 injection: a sliding one-minute request limit and/or a random failure rate
+    rpm = 0
+    fail_rate = 0.0
+    retry_after = 1.0
+    counters = {"requests": 0, "rate_limited": 0}
+    _window = deque()
+    _lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _over_limit(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self.counters["requests"] += 1
+            while self._window and now - self._window[0] > 60:
+                self._window.popleft()
+            limited = (self.rpm and len(self._window) >= self.rpm) or random.random() < self.fail_rate
+            if limited:
+                self.counters["rate_limited"] += 1
+            else:
+                self._window.append(now)
+            return bool(limited)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self._lock:
+                self._send(200, dict(self.counters))
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        if self._over_limit():
+            self._send(429, {"error": {
+                "message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded",
+            }}, headers={"Retry-After": str(self.retry_after)})
+            return
+
+        time.sleep(self.latency)
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = "{}" if json_mode else self.reply
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        completion_tokens = len(content.split())
+        n = int(body.get("n", 1) or 1)
+
+        if body.get("stream"):
+            self._stream(body.get("model", "stub"), content)
+            return
+
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                for i in range(n)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens * n,
+                "total_tokens": prompt_tokens + completion_tokens * n,
+            },
+        })
+
+    def _stream(self, model, content):
+        """SSE chunks word by word over chunked transfer encoding, like the real streaming API."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        words = content.split(" ")
+        deltas = [{"role": "assistant", "content": ""}] + [
+            {"content": word if i == 0 else " " + word} for i, word in enumerate(words)
+        ]
+        for i, delta in enumerate(deltas + [{}]):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(deltas) else None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host="127.0.0.1", port=8787, latency_ms=0, reply=None, rpm=0, fail_rate=0.0, retry_after=1.0):
+    StubHandler.latency = latency_ms / 1000
+    StubHandler.rpm = rpm
+    StubHandler.fail_rate = fail_rate
+    StubHandler.retry_after = retry_after
+    if reply:
+        StubHandler.reply = reply
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    print(f"🧪 LLM stand-in listening on http://{host}:{port}/v1")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--reply", default=None)
+    parser.add_argument("--rpm", type=int, default=0, help="answer 429 above this many requests per minute")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency_ms, args.reply, args.rpm, args.fail_rate, args.retry_after)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,157 @@
+# tools/model_registry.py
+import os
+import threading
+import time
+
+import torch
+from transformers import (
+    CLIPProcessor,
+    CLIPModel,
+    BlipProcessor,
+    BlipForConditionalGeneration,
+)
+
+from tools.inference_backend import prepare_clip, prepare_blip, selected_backend
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+BLIP_MODEL_NAME = "Salesforce/blip-image-captioning-large"
+
+
+def default_device() -> str:
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _model_bytes(model) -> int:
+    params = sum(p.numel() * p.element_size() for p in model.parameters())
+    buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+    # ONNX-backed parts keep their weights in the exported graph files
+    graphs = sum(
+        os.path.getsize(path)
+        for module in model.modules()
+        for path in getattr(module, "onnx_paths", ())
+        if os.path.exists(path)
+    )
+    return params + buffers + graphs
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of vision models and processors.
+    Each (model name, dtype, device, backend) is loaded once and shared by every agent instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}
+        self._stats = {}
+        self._clear_hooks = []
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _hit(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._stats[key]["hits"] += 1
+            return entry
+
+    def _get_or_load(self, key, loader):
+        entry = self._hit(key)
+        if entry is not None:
+            return entry
+
+        # Per-key lock so two different models can load in parallel,
+        # while concurrent requests for the same model wait for one load.
+        with self._key_lock(key):
+            entry = self._hit(key)
+            if entry is not None:
+                return entry
+
+            start = time.perf_counter()
+            model, processor = loader()
+            load_seconds = time.perf_counter() - start
+
+            entry = (model, processor)
+            with self._lock:
+                self._entries[key] = entry
+                self._stats[key] = {
+                    "model": key[0],
+                    "dtype": str(key[1]),
+                    "device": key[2],
+                    "backend": key[3],
+                    "load_seconds": round(load_seconds, 3),
+                    "memory_mb": round(_model_bytes(model) / (1024 ** 2), 1),
+                    "hits": 0,
+                }
+            print(f"📦 Loaded {key[0]} ({key[3]}) on {key[2]} in {load_seconds:.2f}s")
+            return entry
+
+    def get_clip(self, name=CLIP_MODEL_NAME, dtype=torch.float32, device=None, backend=None):
+        device = device or default_device()
+        backend = backend or selected_backend()
+        key = (name, dtype, device, backend)
+
+        def loader():
+            model = CLIPModel.from_pretrained(name, torch_dtype=dtype).to(device)
+            model.eval()
+            processor = CLIPProcessor.from_pretrained(name)
+            return prepare_clip(model, name, backend, device), processor
+
+        return self._get_or_load(key, loader)
+
+    def get_blip(self, name=BLIP_MODEL_NAME, dtype=torch.float32, device=None, backend=None):
+        device = device or default_device()
+        backend = backend or selected_backend()
+        key = (name, dtype, device, backend)
+
+        def loader():
+            model = BlipForConditionalGeneration.from_pretrained(name, torch_dtype=dtype).to(device)
+            model.eval()
+            processor = BlipProcessor.from_pretrained(name)
+            return prepare_blip(model, name, backend, device), processor
+
+        return self._get_or_load(key, loader)
+
+    def preload(self, with_blip=True):
+        """Warm the registry, e.g. from the FastAPI startup hook."""
+        self.get_clip()
+        if with_blip:
+            self.get_blip()
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = [dict(s) for s in self._stats.values()]
+        return {
+            "loaded_models": len(models),
+            "total_memory_mb": round(sum(m["memory_mb"] for m in models), 1),
+            "total_load_seconds": round(sum(m["load_seconds"] for m in models), 3),
+            "models": models,
+        }
+
+    def on_clear(self, hook):
+        """Call `hook()` whenever the registry is cleared, so caches derived from its models go too."""
+        with self._lock:
+            self._clear_hooks.append(hook)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+            hooks = list(self._clear_hooks)
+        for hook in hooks:
+            hook()
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _registry
+
+
+def preload_enabled() -> bool:
+    return os.getenv("MATCHMAX_PRELOAD_MODELS", "1") != "0"
@@ -0,0 +1,189 @@
+# tools/photo_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def hash_image_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_fingerprint(*parts) -> str:
+    """
+    Version tag for everything that influences a cached result
+    (model names, negative prompts, prompt version). Changing any part invalidates old entries.
+    """
+    blob = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class PhotoAnalysisCache:
+    """
+    Persistent, content-addressed cache of per-photo analysis results
+    (BLIP caption, enriched caption, CLIP image embedding, score, tips).
+    Backed by SQLite with LRU eviction once `max_entries` is exceeded.
+    Rows of other fingerprints are pruned only once unused for `stale_after`
+    seconds, so several configurations can share one database.
+    """
+
+    def __init__(self, fingerprint: str, db_path="data/cache/photo_analysis.sqlite3", max_entries=5000,
+                 stale_after=7 * 86400):
+        self.fingerprint = fingerprint
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.stale_after = stale_after
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS photo_analysis (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                blip_caption TEXT,
+                caption TEXT,
+                embedding TEXT,
+                score REAL,
+                tips TEXT,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON photo_analysis(last_access)")
+        self._conn.commit()
+        self.invalidated = self.prune_stale(self.stale_after)
+
+    def _key(self, image_hash: str) -> str:
+        return f"{image_hash}:{self.fingerprint}"
+
+    # ---------- Public API -------------------------------------------------- #
+
+    def prune_stale(self, max_age=None) -> int:
+        """
+        Delete rows written under other fingerprints that have not been read for
+        `max_age` seconds (all of them when None). Rows still in use by another
+        live configuration keep their recent last_access and survive.
+        """
+        cutoff = time.time() - max_age if max_age is not None else float("inf")
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM photo_analysis WHERE fingerprint != ? AND last_access < ?",
+                (self.fingerprint, cutoff),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def get(self, image_hash: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blip_caption, caption, embedding, score, tips FROM photo_analysis WHERE key = ?",
+                (self._key(image_hash),),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE photo_analysis SET last_access = ? WHERE key = ?",
+                (time.time(), self._key(image_hash)),
+            )
+            self._conn.commit()
+
+        blip_caption, caption, embedding, score, tips = row
+        return {
+            "blip_caption": blip_caption,
+            "caption": caption,
+            "embedding": json.loads(embedding) if embedding else None,
+            "score": score,
+            "tips": json.loads(tips) if tips else [],
+        }
+
+    def put(self, image_hash: str, blip_caption=None, caption=None, embedding=None, score=None, tips=None):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO photo_analysis
+                    (key, fingerprint, blip_caption, caption, embedding, score, tips, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    self._key(image_hash),
+                    self.fingerprint,
+                    blip_caption,
+                    caption,
+                    json.dumps(embedding) if embedding is not None else None,
+                    score,
+                    json.dumps(tips or []),
+                    time.time(),
+                ),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM photo_analysis")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM photo_analysis").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "fingerprint": self.fingerprint,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "pruned_on_load": self.invalidated,
+        }
+
+    # ---------- Internal helpers ------------------------------------------- #
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM photo_analysis").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM photo_analysis WHERE key IN (
+                    SELECT key FROM photo_analysis ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+            self.evictions += overflow
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def photo_cache_enabled() -> bool:
+    return os.getenv("MATCHMAX_PHOTO_CACHE", "1") != "0"
+
+
+def get_photo_cache(fingerprint: str) -> PhotoAnalysisCache:
+    with _caches_lock:
+        if fingerprint not in _caches:
+            _caches[fingerprint] = PhotoAnalysisCache(
+                fingerprint,
+                db_path=os.getenv("MATCHMAX_PHOTO_CACHE_PATH", "data/cache/photo_analysis.sqlite3"),
+                max_entries=int(os.getenv("MATCHMAX_PHOTO_CACHE_MAX_ENTRIES", "5000")),
+                stale_after=float(os.getenv("MATCHMAX_PHOTO_CACHE_STALE_DAYS", "7")) * 86400,
+            )
+        return _caches[fingerprint]
+
+
+def photo_cache_stats() -> dict:
+    with _caches_lock:
+        return {fp: cache.stats() for fp, cache in _caches.items()}
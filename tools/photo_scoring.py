@@ -0,0 +1,173 @@
+# tools/photo_scoring.py
+import os
+import threading
+
+import torch
+
+from tools.model_registry import get_model_registry
+from tools.vision_tool import encode_images, encode_texts, get_text_bank, logit_scale
+
+# Weighted prompt categories (v2 scoring)
+PROMPT_CATEGORIES = {
+    "expression": {
+        "natural smile": 2,
+        "confident body language": 1.5,
+        "natural and confident expression": 2,
+        "relaxed posture": 1.2
+    },
+    "composition": {
+        "clear profile photo": 2,
+        "sharp focus face": 1.5,
+        "professional headshot": 1.8,
+        "shoulders visible": 1.2
+    },
+    "lighting": {
+        "bright background": 1,
+        "outdoor lighting": 1.5,
+        "indoor soft lighting": 1.2
+    },
+    "engagement": {
+        "eye contact with camera": 2,
+        "friendly looking person": 1.5,
+        "inviting gesture": 1
+    },
+    "style & setting": {
+        "well-groomed appearance": 1.3,
+        "trendy outfit": 1,
+        "tidy background": 1,
+        "neutral background": 0.8
+    }
+}
+
+TIPS_MAP = {
+    "natural smile": "Use a relaxed, candid smile instead of forced grins.",
+    "confident body language": "Stand tall or sit comfortably, avoid crossed arms.",
+    "natural and confident expression": "Avoid looking too posed—look relaxed and sincere.",
+    "relaxed posture": "Angle your shoulders and avoid stiff body language.",
+    "clear profile photo": "Use high-resolution, clean images with no overlays or filters.",
+    "sharp focus face": "Make sure your face is well-lit and crisp, not blurry.",
+    "professional headshot": "Frame the photo at chest-level or higher with clear lighting.",
+    "shoulders visible": "Avoid extreme close-ups—show upper body for context.",
+    "bright background": "Take photos during the day or in well-lit environments.",
+    "outdoor lighting": "Natural sunlight helps create vibrant, realistic photos.",
+    "indoor soft lighting": "Use warm lighting; avoid harsh shadows or direct flash.",
+    "eye contact with camera": "Looking into the lens creates a stronger connection.",
+    "friendly looking person": "Let your expression reflect warmth and openness.",
+    "inviting gesture": "Small waves or open arms help convey friendliness.",
+    "well-groomed appearance": "Style your hair and groom facial hair cleanly.",
+    "trendy outfit": "Wear outfits that are flattering and reflect your style.",
+    "tidy background": "Avoid clutter—clean, minimalistic settings work best.",
+    "neutral background": "Plain walls or natural settings keep the focus on you."
+}
+
+# Negative prompts for contrastive scoring (v3 scoring)
+NEGATIVE_PROMPTS = [
+    "a blurry image",
+    "a group photo",
+    "a low-quality selfie",
+    "a messy background",
+    "a poorly lit photo",
+]
+
+
+class PhotoScoringEngine:
+    """
+    One CLIP pass, both scores.
+    The image embedding is matched against the category prompts and the negatives
+    in a single matmul; the v2 weighted score is a dot product with a precomputed
+    prompt-weight vector, and the v3 contrastive score reuses the same negative logits.
+    """
+
+    def __init__(self, model, processor, device,
+                 prompt_categories=PROMPT_CATEGORIES, negatives=NEGATIVE_PROMPTS,
+                 contrastive_weight=None, top_k_reasons=5):
+        self.model = model
+        self.processor = processor
+        self.device = device
+        self.prompt_categories = prompt_categories
+        self.negatives = list(negatives)
+        self.top_k_reasons = top_k_reasons
+        if contrastive_weight is None:
+            contrastive_weight = float(os.getenv("MATCHMAX_CONTRASTIVE_WEIGHT", "0.5"))
+        self.contrastive_weight = contrastive_weight
+
+        # Stable prompt order; a prompt listed under several categories sums its weights
+        weights = {}
+        for category in prompt_categories.values():
+            for prompt, weight in category.items():
+                weights[prompt] = weights.get(prompt, 0) + weight
+        self.prompts = list(weights)
+        total = sum(weights.values()) or 1.0
+        self.prompt_weights = torch.tensor([weights[p] / total for p in self.prompts], device=device)
+
+        self.bank = get_text_bank(model, processor, device)
+        self._all_prompts = self.prompts + self.negatives
+
+    def fingerprint_parts(self) -> tuple:
+        return (self.prompt_categories, self.negatives, self.contrastive_weight, self.top_k_reasons)
+
+    def embed(self, images, chunk_size: int = 32) -> torch.Tensor:
+        chunks = [
+            encode_images(self.model, self.processor, images[i:i + chunk_size], self.device)
+            for i in range(0, len(images), chunk_size)
+        ]
+        return torch.cat(chunks) if chunks else torch.empty(0)
+
+    def score(self, image_embeds: torch.Tensor, captions=None) -> list:
+        """
+        Score a batch of L2-normalised image embeddings. With captions, the
+        contrastive score is blended into the final `score`; without, `score`
+        is the weighted category score alone (cheap CLIP-only prefilter).
+        """
+        if len(image_embeds) == 0:
+            return []
+        image_embeds = image_embeds.to(self.device).float()
+        n_prompts = len(self.prompts)
+
+        logits = self.bank.similarity_logits(image_embeds, self._all_prompts)
+        probs = logits[:, :n_prompts].softmax(dim=1)
+        category_scores = (probs @ self.prompt_weights) * 100
+        top_indices = torch.topk(probs, k=min(self.top_k_reasons, n_prompts), dim=1).indices.tolist()
+
+        contrastive_scores = None
+        if captions is not None:
+            caption_embeds = encode_texts(self.model, self.processor, captions, self.device)
+            pos = logit_scale(self.model) * (image_embeds * caption_embeds).sum(dim=-1, keepdim=True)
+            contrastive = torch.cat([pos, logits[:, n_prompts:]], dim=1).softmax(dim=1)[:, 0]
+            contrastive_scores = (contrastive * 100).tolist()
+
+        results = []
+        for i, category_score in enumerate(category_scores.tolist()):
+            result = {
+                "category_score": round(category_score, 1),
+                "reasons": [self.prompts[j] for j in top_indices[i]],
+            }
+            if contrastive_scores is not None:
+                w = self.contrastive_weight
+                result["contrastive_score"] = round(contrastive_scores[i], 1)
+                result["score"] = round(w * contrastive_scores[i] + (1 - w) * category_score, 1)
+            else:
+                result["score"] = result["category_score"]
+            results.append(result)
+        return results
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_scoring_engine(model, processor, device) -> PhotoScoringEngine:
+    key = (id(model), device)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = PhotoScoringEngine(model, processor, device)
+        return _engines[key]
+
+
+def clear_scoring_engines():
+    with _engines_lock:
+        _engines.clear()
+
+
+# Engines are keyed by id(model): drop them with the models they were built for
+get_model_registry().on_clear(clear_scoring_engines)
@@ -0,0 +1,148 @@
+# tools/platform_rules.py
+import json
+import os
+import re
+import threading
+
+import yaml
+
+RULES_PATH = "config/platform_rules.yaml"
+METADATA_PATH = "data/platform_metadata.json"
+DEFAULT_MAX_LENGTH = 500
+EMOJI_POLICIES = ("allow", "preserve", "none")
+
+# Common emoji blocks plus variation selectors / ZWJ used in emoji sequences
+EMOJI_PATTERN = re.compile("[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]")
+
+
+class PlatformRules:
+    """Compiled rules for one platform: character limit, emoji policy and banned phrases."""
+
+    def __init__(self, platform: str, max_length: int, emoji: str = "preserve", banned_phrases=()):
+        if emoji not in EMOJI_POLICIES:
+            raise ValueError(f"Unknown emoji policy for {platform}: {emoji!r} (expected one of {EMOJI_POLICIES})")
+        self.platform = platform
+        self.max_length = max_length
+        self.emoji = emoji
+        self.banned_phrases = sorted({p.lower() for p in banned_phrases})
+        # One alternation regex for all phrases, matched on word boundaries
+        self._banned = (
+            re.compile(r"\b(?:" + "|".join(re.escape(p) for p in self.banned_phrases) + r")\b", re.IGNORECASE)
+            if self.banned_phrases else None
+        )
+
+    def with_max_length(self, max_length) -> "PlatformRules":
+        """Copy with a tighter limit (a user's max_bio_length can only lower the platform's)."""
+        if not max_length or max_length >= self.max_length:
+            return self
+        return PlatformRules(self.platform, max_length, self.emoji, self.banned_phrases)
+
+    def emojis_allowed(self, original: str = None) -> bool:
+        if self.emoji == "allow":
+            return True
+        if self.emoji == "preserve":
+            return bool(original and EMOJI_PATTERN.search(original))
+        return False
+
+    def validate(self, bio: str, original: str = None) -> list:
+        """Human-readable violations; empty when the bio complies. `original` decides the preserve policy."""
+        violations = []
+        if len(bio) > self.max_length:
+            violations.append(f"is {len(bio)} characters; the limit is {self.max_length}")
+        if not self.emojis_allowed(original) and EMOJI_PATTERN.search(bio):
+            violations.append("contains emojis, which are not allowed here")
+        if self._banned is not None:
+            found = sorted({m.group(0).lower() for m in self._banned.finditer(bio)})
+            if found:
+                violations.append("uses banned phrases: " + ", ".join(f'"{p}"' for p in found))
+        return violations
+
+    def enforce(self, bio: str, original: str = None) -> str:
+        """Deterministic last resort: drop banned phrases and disallowed emojis, then trim to the limit at a clean boundary."""
+        cleaned = False
+        if self._banned is not None:
+            bio, removed = self._banned.subn("", bio)
+            cleaned = bool(removed)
+        if not self.emojis_allowed(original):
+            bio = EMOJI_PATTERN.sub("", bio)
+            cleaned = True
+        if cleaned:
+            # A removed phrase leaves its punctuation behind ("nerd, , wanted" → "nerd, wanted")
+            bio = re.sub(r"([,.!?;:])(?:\s+[,.!?;:])+", r"\1", bio)
+            bio = re.sub(r"\s+([,.!?;:])", r"\1", re.sub(r"\s{2,}", " ", bio)).strip().lstrip(",.!?;: ")
+        if len(bio) <= self.max_length:
+            return bio
+        cut = bio[:self.max_length]
+        for boundary in (". ", "! ", "? "):
+            idx = cut.rfind(boundary)
+            if idx >= self.max_length // 2:
+                return cut[:idx + 1]
+        return cut.rsplit(" ", 1)[0].rstrip(",;:- ")
+
+
+class PlatformRulesEngine:
+    """Rules for every platform, built once from platform_rules.yaml and platform_metadata.json."""
+
+    def __init__(self, rules_path=RULES_PATH, metadata_path=METADATA_PATH):
+        config = _load_yaml(rules_path)
+        metadata = _load_json(metadata_path)
+        default = config.get("default") or {}
+        platforms = config.get("platforms") or {}
+
+        self._default = self._compile("default", default, {}, metadata)
+        self._rules = {
+            name.lower(): self._compile(name, default, platforms.get(name) or {}, metadata)
+            for name in set(platforms) | set(metadata)
+        }
+
+    @staticmethod
+    def _compile(name, default, overrides, metadata) -> PlatformRules:
+        limit = (
+            overrides.get("max_length")
+            or metadata.get(name, {}).get("bio_limit")
+            or default.get("max_length")
+            or DEFAULT_MAX_LENGTH
+        )
+        return PlatformRules(
+            platform=name,
+            max_length=int(limit),
+            emoji=overrides.get("emoji", default.get("emoji", "preserve")),
+            banned_phrases=list(default.get("banned_phrases") or []) + list(overrides.get("banned_phrases") or []),
+        )
+
+    def for_platform(self, platform: str, max_length=None) -> PlatformRules:
+        rules = self._rules.get((platform or "").lower(), self._default)
+        return rules.with_max_length(max_length)
+
+    def platforms(self) -> list:
+        return sorted(r.platform for r in self._rules.values())
+
+
+def _load_yaml(path) -> dict:
+    try:
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        print(f"⚠️ Platform rules file not found: {path}")
+        return {}
+
+
+def _load_json(path) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Metadata file not found: {path}")
+        return {}
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_platform_rules(rules_path=RULES_PATH, metadata_path=METADATA_PATH) -> PlatformRulesEngine:
+    key = (os.path.abspath(rules_path), os.path.abspath(metadata_path))
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = PlatformRulesEngine(rules_path, metadata_path)
+        return _engines[key]
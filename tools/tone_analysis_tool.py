@@ -1,15 +1,23 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+import asyncio
+from tools.llm_client import get_llm_client
+from tools.tone_classifier import get_tone_classifier, label_logging_enabled, local_tone_enabled, tone_confidence_threshold
 
 class ToneAnalysisTool:
-    def __init__(self):
+    def __init__(self, llm=None, use_local=None, confidence_threshold=None, log_labels=None):
+        self.llm = llm or get_llm_client()
         self.label_set = ["funny", "confident", "romantic", "witty", "mysterious", "professional", "casual"]
 
-    def analyze_tone(self, text: str) -> str:
+        # Local classifier answers confident cases without a network round-trip
+        use_local = local_tone_enabled() if use_local is None else use_local
+        self.classifier = get_tone_classifier(self.label_set) if use_local else None
+        # Only with an explicit opt-in are LLM-labelled bios (user text) written to disk for refits
+        self.log_labels = label_logging_enabled() if log_labels is None else log_labels
+        # Minimum top-1 vs top-2 probability margin; None uses the classifier's calibrated one
+        self.confidence_threshold = (
+            tone_confidence_threshold() if confidence_threshold is None else confidence_threshold
+        )
+
+    def _tone_request(self, text: str) -> dict:
         system_prompt = (
             "You are a language expert. Given a user's bio or dating profile text, "
             "identify the dominant tone from the following options: "
@@ -17,16 +25,77 @@ class ToneAnalysisTool:
             ". Only return the most likely label. No explanation needed."
         )
 
-        response = client.chat.completions.create(
+        return dict(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": text}
             ],
-            temperature=0.2
+            temperature=0.2,
+            # Low-temperature classification over a fixed label set: always cacheable
+            cache=True
         )
 
-        tone = response.choices[0].message.content.strip().lower()
+    def _parse_tone(self, raw: str) -> str:
+        tone = raw.lower()
         if tone in self.label_set:
             return tone
-        return "unknown"
\ No newline at end of file
+        return "unknown"
+
+    def classify_locally(self, text: str):
+        """
+        (label, confident) from the local classifier alone: no LLM call and no
+        local/escalated accounting. (None, False) when the classifier is off or fails.
+        """
+        if self.classifier is None:
+            return None, False
+        try:
+            self.classifier.ensure_trained()
+            label, margin = self.classifier.predict(text)
+        except Exception as e:
+            print(f"⚠️ Local tone classifier failed: {e}")
+            return None, False
+        return label, label is not None and self.classifier.accepts(margin, self.confidence_threshold)
+
+    async def aclassify_locally(self, text: str):
+        # Only the very first fit can be slow; it runs in a worker thread, never on the loop
+        if self.classifier is not None and not self.classifier.trained:
+            await asyncio.to_thread(self.classifier.ensure_trained)
+        return self.classify_locally(text)
+
+    def _count(self, label, confident):
+        if label is not None and confident:
+            self.classifier.count("local")
+            return label
+        self.classifier.count("escalated")
+        return None
+
+    def local_tone(self, text: str):
+        """The local classifier's label when its margin clears the threshold, else None (ask the LLM)."""
+        if self.classifier is None:
+            return None
+        return self._count(*self.classify_locally(text))
+
+    async def alocal_tone(self, text: str):
+        if self.classifier is None:
+            return None
+        return self._count(*await self.aclassify_locally(text))
+
+    def _learn(self, text: str, tone: str):
+        if self.classifier is not None and self.log_labels and tone != "unknown":
+            self.classifier.record(text, tone)
+
+    def analyze_tone(self, text: str) -> str:
+        tone = self.local_tone(text)
+        if tone is None:
+            tone = self._parse_tone(self.llm.complete(**self._tone_request(text)))
+            self._learn(text, tone)
+        return tone
+
+    async def aanalyze_tone(self, text: str) -> str:
+        tone = await self.alocal_tone(text)
+        if tone is None:
+            tone = self._parse_tone(await self.llm.acomplete(**self._tone_request(text)))
+            # Appending (and occasionally compacting) the label log is file I/O
+            await asyncio.to_thread(self._learn, text, tone)
+        return tone
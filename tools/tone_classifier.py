@@ -0,0 +1,271 @@
+# tools/tone_classifier.py
+import json
+import os
+import re
+import threading
+from collections import deque
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+from sklearn.pipeline import FeatureUnion, Pipeline
+
+SEED_PATH = "prompts/tone_examples.md"
+LABEL_LOG_PATH = "data/tone_labels.jsonl"
+# Used when there are too few examples per label to calibrate on held-out folds
+FALLBACK_MARGIN = 0.15
+
+_EXAMPLE_LINE = re.compile(r"^-\s*([a-z]+)\s*:\s*(.+)$")
+
+
+def load_seed_examples(path=SEED_PATH, labels=None) -> list:
+    """Parse '- <label>: <text>' lines from the tone examples prompt file."""
+    examples = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                match = _EXAMPLE_LINE.match(line.strip())
+                if match and (labels is None or match.group(1) in labels):
+                    examples.append((match.group(2), match.group(1)))
+    except FileNotFoundError:
+        print(f"⚠️ Tone seed file not found: {path}")
+    return examples
+
+
+def load_logged_labels(path=LABEL_LOG_PATH, labels=None, limit=None) -> list:
+    """The newest `limit` logged labels (all when None)."""
+    examples = deque(maxlen=limit)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if labels is None or row.get("label") in labels:
+                examples.append((row["text"], row["label"]))
+    return list(examples)
+
+
+def calibrate_margin(margins, correct, target_precision: float):
+    """
+    Lowest top-1 vs top-2 margin at which held-out predictions with at least
+    that margin are still `target_precision` accurate; None if no margin is.
+    """
+    order = np.argsort(margins)[::-1]
+    hits = np.cumsum(np.asarray(correct, dtype=float)[order])
+    precision = hits / np.arange(1, len(order) + 1)
+    ok = np.nonzero(precision >= target_precision)[0]
+    if not len(ok):
+        return None
+    return float(np.asarray(margins)[order][ok[-1]])
+
+
+class LocalToneClassifier:
+    """
+    Millisecond tone detection on CPU: word + character TF-IDF features into a
+    logistic regression, trained on the seed examples plus the newest labels the
+    LLM has produced. `predict` returns (label, margin) where margin is the gap
+    between the top two class probabilities; with seven labels the top
+    probability alone stays low even when the ranking is clear. `accepts` compares
+    the margin with a threshold calibrated on held-out folds of the training data,
+    so local answers keep roughly `target_precision` accuracy.
+
+    Only the first model is fitted inline (`ensure_trained`). Refits after new
+    labels run in a background thread while the previous model keeps serving.
+    """
+
+    def __init__(self, labels, seed_path=SEED_PATH, log_path=LABEL_LOG_PATH, retrain_every=25,
+                 max_logged=5000, target_precision=0.85, margin=None):
+        self.labels = list(labels)
+        self.seed_path = seed_path
+        self.log_path = log_path
+        self.retrain_every = retrain_every
+        self.max_logged = max_logged
+        self.target_precision = target_precision
+        # A fixed margin overrides calibration
+        self.fixed_margin = margin
+        self.margin = margin if margin is not None else FALLBACK_MARGIN
+
+        self._lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        self._training = False
+        self._model = None
+        self._new_labels = 0
+        self._logged = None
+        self.stats = {"local": 0, "escalated": 0, "trained_on": 0, "retrains": 0}
+
+    def _build(self):
+        return Pipeline([
+            ("features", FeatureUnion([
+                ("words", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)),
+                ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True)),
+            ])),
+            ("clf", LogisticRegression(max_iter=2000, C=10.0)),
+        ])
+
+    # ---------- training --------------------------------------------------- #
+
+    def _calibrate(self, texts, targets):
+        counts = {label: targets.count(label) for label in set(targets)}
+        folds = min(5, min(counts.values()))
+        if folds < 2:
+            return FALLBACK_MARGIN
+        cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=0)
+        probs = cross_val_predict(self._build(), texts, targets, cv=cv, method="predict_proba")
+        classes = np.array(sorted(counts))
+        top2 = np.sort(probs, axis=1)[:, -2:]
+        correct = classes[probs.argmax(axis=1)] == np.array(targets)
+        margin = calibrate_margin(top2[:, 1] - top2[:, 0], correct, self.target_precision)
+        # No margin reaches the target precision: every call goes to the LLM
+        return margin if margin is not None else 1.0
+
+    def train(self, only_if_untrained=False):
+        with self._train_lock:
+            if only_if_untrained and self._model is not None:
+                return
+            examples = (
+                load_seed_examples(self.seed_path, self.labels)
+                + load_logged_labels(self.log_path, self.labels, limit=self.max_logged)
+            )
+            if len({label for _, label in examples}) < 2:
+                print("⚠️ Not enough tone examples to train the local classifier")
+                return
+            texts, targets = (list(column) for column in zip(*examples))
+            model = self._build()
+            model.fit(texts, targets)
+            margin = self.fixed_margin if self.fixed_margin is not None else self._calibrate(texts, targets)
+            with self._lock:
+                self._model = model
+                self.margin = margin
+                self._new_labels = 0
+                self.stats["trained_on"] = len(examples)
+                self.stats["retrains"] += 1
+
+    @property
+    def trained(self) -> bool:
+        return self._model is not None
+
+    def ensure_trained(self) -> bool:
+        """Fit the first model if there is none yet (blocking). Later refits never block callers."""
+        if not self.trained:
+            self.train(only_if_untrained=True)
+        return self.trained
+
+    def train_in_background(self):
+        """Single-flight refit on a daemon thread; predictions use the current model meanwhile."""
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+
+        def run():
+            try:
+                self.train()
+            except Exception as e:
+                print(f"⚠️ Tone classifier retrain failed: {e}")
+            finally:
+                with self._lock:
+                    self._training = False
+
+        threading.Thread(target=run, name="tone-classifier-train", daemon=True).start()
+
+    # ---------- prediction ------------------------------------------------- #
+
+    def predict(self, text: str):
+        model = self._model
+        if model is None:
+            return None, 0.0
+        probs = model.predict_proba([text])[0]
+        first, second = np.argsort(probs)[::-1][:2]
+        return str(model.classes_[first]), float(probs[first] - probs[second])
+
+    def accepts(self, margin: float, threshold=None) -> bool:
+        return margin >= (self.margin if threshold is None else threshold)
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def stats_snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "margin": round(self.margin, 3), "training": self._training}
+
+    # ---------- label log -------------------------------------------------- #
+
+    def record(self, text: str, label: str):
+        """Log an LLM-decided label; every `retrain_every` labels a background refit picks them up."""
+        if label not in self.labels:
+            return
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with self._lock:
+            if self._logged is None:
+                self._logged = _count_lines(self.log_path)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps({"text": text, "label": label}) + "\n")
+            self._logged += 1
+            # Compact once the log is a quarter over its cap, so rewrites stay rare
+            if self._logged > self.max_logged * 1.25:
+                self._logged = _keep_last_lines(self.log_path, self.max_logged)
+            self._new_labels += 1
+            retrain = self._new_labels >= self.retrain_every
+        if retrain:
+            self.train_in_background()
+
+
+def _count_lines(path) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as f:
+        return sum(1 for _ in f)
+
+
+def _keep_last_lines(path, n) -> int:
+    with open(path, "r") as f:
+        lines = deque(f, maxlen=n)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    return len(lines)
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def local_tone_enabled() -> bool:
+    return os.getenv("MATCHMAX_LOCAL_TONE", "1") != "0"
+
+
+def label_logging_enabled() -> bool:
+    """
+    Whether bios the LLM labelled are appended to the label log for refits. Off by
+    default: the log holds raw user-supplied text, so keeping it is an explicit opt-in.
+    """
+    return os.getenv("MATCHMAX_TONE_LOG_LABELS", "0") == "1"
+
+
+def tone_confidence_threshold():
+    """Fixed top-1 vs top-2 margin from MATCHMAX_TONE_CONFIDENCE, or None to use the calibrated one."""
+    value = os.getenv("MATCHMAX_TONE_CONFIDENCE")
+    return float(value) if value else None
+
+
+def get_tone_classifier(labels) -> LocalToneClassifier:
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = LocalToneClassifier(
+                labels,
+                max_logged=int(os.getenv("MATCHMAX_TONE_LOG_MAX", "5000")),
+                target_precision=float(os.getenv("MATCHMAX_TONE_PRECISION", "0.85")),
+                margin=tone_confidence_threshold(),
+            )
+        return _classifier
+
+
+def tone_classifier_stats() -> dict:
+    return _classifier.stats_snapshot() if _classifier is not None else {}
@@ -0,0 +1,29 @@
+# tools/user_profile.py
+import json
+
+from pydantic import BaseModel
+
+
+class UserInput(BaseModel):
+    name: str
+    age: int
+    location: str
+    interests: list[str]
+    personality_traits: list[str]
+    goal: str
+    preferred_tone: str = "casual"
+    platform: str = "Tinder"
+    max_bio_length: int = 280
+
+
+def load_user_data(user_data_path: str = None, user_data=None) -> dict:
+    """
+    The agents' view of a user profile: the in-memory `user_data` when given
+    (a validated UserInput or a plain dict, e.g. from the API), otherwise the
+    JSON file at `user_data_path` (CLI workflows).
+    """
+    if user_data is not None:
+        # dict() works for both a plain dict and a flat pydantic model
+        return dict(user_data)
+    with open(user_data_path, 'r') as f:
+        return json.load(f)
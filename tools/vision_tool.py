@@ -0,0 +1,83 @@
+# tools/vision_tool.py
+import threading
+
+import torch
+
+from tools.inference_backend import inference_context
+from tools.model_registry import get_model_registry
+
+
+def encode_images(model, processor, images, device) -> torch.Tensor:
+    """
+    Run a batch of PIL images through the CLIP vision tower in one pass.
+    Returns L2-normalised embeddings of shape (n_images, dim).
+    """
+    inputs = processor(images=list(images), return_tensors="pt").to(device)
+    with inference_context(model):
+        feats = model.get_image_features(**inputs)
+    feats = feats.float()
+    return feats / feats.norm(dim=-1, keepdim=True)
+
+
+def encode_texts(model, processor, texts, device) -> torch.Tensor:
+    """Encode a list of prompts with the CLIP text tower; L2-normalised (n_texts, dim)."""
+    inputs = processor(text=list(texts), return_tensors="pt", padding=True, truncation=True).to(device)
+    with inference_context(model):
+        feats = model.get_text_features(**inputs)
+    feats = feats.float()
+    return feats / feats.norm(dim=-1, keepdim=True)
+
+
+def logit_scale(model) -> float:
+    return model.logit_scale.exp().item()
+
+
+class TextEmbeddingBank:
+    """
+    Caches text embeddings for fixed prompt sets (negatives, scoring categories)
+    so they are encoded once per model instead of once per image.
+    """
+
+    def __init__(self, model, processor, device):
+        self.model = model
+        self.processor = processor
+        self.device = device
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def get(self, prompts) -> torch.Tensor:
+        key = tuple(prompts)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = encode_texts(self.model, self.processor, key, self.device)
+            return self._cache[key]
+
+    def similarity_logits(self, image_embeds: torch.Tensor, prompts) -> torch.Tensor:
+        """(n_images, n_prompts) CLIP logits from a single matmul against the cached bank."""
+        text_embeds = self.get(prompts).to(image_embeds.dtype)
+        return logit_scale(self.model) * image_embeds @ text_embeds.T
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_text_bank(model, processor, device) -> TextEmbeddingBank:
+    """One bank per loaded model, so every agent sharing the model shares its cache."""
+    key = (id(model), device)
+    with _banks_lock:
+        # The bank holds the model, so its id cannot be recycled while the entry exists
+        if key not in _banks:
+            _banks[key] = TextEmbeddingBank(model, processor, device)
+        return _banks[key]
+
+
+def clear_text_banks():
+    with _banks_lock:
+        _banks.clear()
+
+
+get_model_registry().on_clear(clear_text_banks)
@@ -1,46 +1,95 @@
 import os
 import json
+import asyncio
 from datetime import datetime
 from agents.bio_writer_agent import BioWriterAgent
 from agents.tone_style_agent import ToneStyleAgent
 from agents.platform_optimizer_agent import PlatformOptimizerAgent
-from agents.photo_selector_agent import PhotoSelectorAgent
+from agents.photo_selector_agent_v3 import PhotoSelectorAgent
+from tools.llm_client import get_llm_client
+from tools.llm_scheduler import set_llm_priority
+from tools.async_helpers import run_branches
 
-def run_ab_test():
-    print("\n🧪 Starting A/B Test Profile Generation...")
+def run_ab_test(n_variants: int = 2, photos_per_variant: int = None):
+    """
+    Build `n_variants` profile variants at once. Bios come from one
+    multi-candidate generation call, each then tone- and platform-checked
+    concurrently; photos are analysed once and each variant gets a different
+    ordering (lead photo) of the shared ranking, optionally cut to a subset.
+    """
+    if n_variants < 1:
+        raise ValueError("n_variants must be at least 1")
+    print(f"\n🧪 Starting A/B Test Profile Generation ({n_variants} variants)...")
 
-    # Initialize agents
-    bio_agent = BioWriterAgent()
-    tone_agent = ToneStyleAgent()
-    platform_agent = PlatformOptimizerAgent()
-    photo_agent = PhotoSelectorAgent()
+    bios, photos = asyncio.run(_generate_variants(n_variants))
+    photo_sets = _photo_variants(photos, n_variants, photos_per_variant)
 
     variants = {}
+    for i, (bio, photo_set) in enumerate(zip(bios, photo_sets)):
+        label = _variant_label(i)
+        print(f"\n🔹 Variant {label}: {bio}")
+        if photo_set:
+            print(f"   📸 Lead photo: {photo_set[0]['filename']}")
+        variants[label] = {
+            "bio": bio,
+            "photos": [
+                {"filename": img["filename"], "score": img["score"], "caption": img["caption"]}
+                for img in photo_set
+            ]
+        }
+
+    save_ab_test_results(variants, photos)
 
-    for variant in ["A", "B"]:
-        print(f"\n🔹 Generating Variant {variant}...")
+async def _generate_variants(k: int):
+    # A/B runs are background work: keep interactive API traffic ahead of them
+    set_llm_priority("batch")
+    try:
+        return await run_branches(_bio_variants(k), _analyse_photos())
+    finally:
+        await get_llm_client().aclose()
 
-        # Step 1: Generate new bio
-        raw_bio = bio_agent.generate_bio()
+async def _bio_variants(k: int) -> list:
+    bio_agent = BioWriterAgent()
+    tone_agent = ToneStyleAgent()
+    platform_agent = PlatformOptimizerAgent()
 
-        # Step 2: Tone adjust
-        adjusted_bio = tone_agent.adjust_tone_if_needed(raw_bio)
+    # Step 1: k candidates from a single generation call
+    candidates = await bio_agent.agenerate_bio_candidates(k)
+    if len(candidates) < k:
+        print(f"⚠️ Got {len(candidates)} of {k} bio candidates; generating the rest individually")
+        candidates += await asyncio.gather(*(bio_agent.agenerate_bio() for _ in range(k - len(candidates))))
 
-        # Step 3: Optimize for platform
-        final_bio = platform_agent.optimize_for_platform(adjusted_bio)
+    # Steps 2-3: tone + platform for every candidate concurrently
+    async def finish(raw_bio):
+        adjusted_bio = await tone_agent.aadjust_tone(raw_bio)
+        return await platform_agent.aoptimize(adjusted_bio)
 
-        # Step 4: Get top photos (simulate minor variation by shuffling or reordering)
-        photos = photo_agent.select_best_images()
-        shuffled_photos = photos[::-1] if variant == "B" else photos
+    return await asyncio.gather(*(finish(bio) for bio in candidates[:k]))
 
-        variants[variant] = {
-            "bio": final_bio,
-            "photos": [{"filename": img, "score": score} for img, score in shuffled_photos]
-        }
+async def _analyse_photos() -> list:
+    # Step 4: one photo analysis shared by every variant (model loading stays off the loop)
+    photo_agent = await asyncio.to_thread(PhotoSelectorAgent)
+    try:
+        return await photo_agent.select_best_images()
+    finally:
+        photo_agent.release_artifacts()
+
+def _photo_variants(photos: list, k: int, photos_per_variant: int = None) -> list:
+    """Variant i leads with the i-th best photo (cycling), followed by the rest in rank order."""
+    if not photos:
+        return [[] for _ in range(k)]
+    size = photos_per_variant or len(photos)
+    variants = []
+    for i in range(k):
+        lead = i % len(photos)
+        order = [photos[lead]] + photos[:lead] + photos[lead + 1:]
+        variants.append(order[:size])
+    return variants
 
-    save_ab_test_results(variants)
+def _variant_label(i: int) -> str:
+    return chr(ord("A") + i) if i < 26 else f"V{i + 1}"
 
-def save_ab_test_results(variants):
+def save_ab_test_results(variants, photo_analysis=None):
     version_dir = "data/profile_versions"
     os.makedirs(version_dir, exist_ok=True)
 
@@ -49,11 +98,12 @@ def save_ab_test_results(variants):
 
     payload = {
         "generated_at": timestamp,
-        "variant_A": variants["A"],
-        "variant_B": variants["B"]
+        "n_variants": len(variants),
+        "variants": variants,
+        "photo_analysis": photo_analysis or []
     }
 
     with open(filename, "w") as f:
         json.dump(payload, f, indent=2)
 
-    print(f"\n📊 A/B Test profiles saved to {filename}")
\ No newline at end of file
+    print(f"\n📊 A/B Test profiles ({len(variants)} variants) saved to {filename}")
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import asyncio
+import itertools
+from pydantic import ValidationError
+from agents.bio_writer_agent import BioWriterAgent
+from agents.tone_style_agent import ToneStyleAgent
+from agents.platform_optimizer_agent import PlatformOptimizerAgent
+from agents.fused_bio_agent import FusedBioAgent, fused_bio_enabled
+from tools.llm_client import get_llm_client
+from tools.llm_scheduler import set_llm_priority
+from tools.user_profile import UserInput
+
+
+def batch_concurrency() -> int:
+    return int(os.getenv("MATCHMAX_BATCH_CONCURRENCY", "8"))
+
+
+async def _no_events(event, data):
+    pass
+
+
+async def agenerate_profile_bio(profile, fused=None, on_event=None):
+    """
+    generate → tone → platform for one in-memory profile (or one fused call). Returns (bio, steps).
+    `on_event(event, data)`, if given, is awaited with each bio_token delta (the
+    first draft is then streamed) and a stage event after every step.
+    """
+    emit = on_event or _no_events
+    if fused if fused is not None else fused_bio_enabled():
+        fused_agent = FusedBioAgent(user_data=profile)
+        final_bio = await fused_agent.agenerate()
+        await emit("stage", {"stage": "bio", "bio": final_bio, "steps": fused_agent.steps})
+        return final_bio, fused_agent.steps
+
+    bio_agent = BioWriterAgent(user_data=profile)
+    if on_event is None:
+        raw_bio = await bio_agent.agenerate_bio()
+    else:
+        parts = []
+        async for delta in bio_agent.astream_bio():
+            parts.append(delta)
+            await emit("bio_token", {"text": delta})
+        raw_bio = "".join(parts).strip()
+    await emit("stage", {"stage": "generate", "bio": raw_bio})
+
+    tone_agent = ToneStyleAgent(user_data=profile)
+    adjusted_bio = await tone_agent.aadjust_tone(raw_bio)
+    await emit("stage", {"stage": "tone", "bio": adjusted_bio})
+
+    platform_agent = PlatformOptimizerAgent(user_data=profile)
+    final_bio = await platform_agent.aoptimize(adjusted_bio)
+    await emit("stage", {"stage": "platform", "bio": final_bio})
+    return final_bio, ["generate", "tone", "platform"]
+
+
+async def _generate_one(index, record, fused):
+    start = time.perf_counter()
+    result = {"index": index}
+    try:
+        if isinstance(record, Exception):
+            raise record
+        profile = record if isinstance(record, UserInput) else UserInput(**record)
+        result["name"] = profile.name
+        bio, steps = await agenerate_profile_bio(profile, fused)
+        result.update(ok=True, bio=bio, bio_steps=steps)
+    except ValidationError as e:
+        result.update(ok=False, error=f"invalid record: {e.errors()}")
+    except Exception as e:
+        # One bad record or failed call never takes the rest of the batch down
+        result.update(ok=False, error=str(e))
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def agenerate_bios(records, concurrency: int = None, fused=None):
+    """
+    Run the bio chain for many users with at most `concurrency` profiles in flight.
+    `records` is any iterable or async iterable of UserInput / dicts, consumed
+    lazily so NDJSON batches of thousands never sit in memory at once.
+    Yields one result dict per record, in completion order, tagged with its input `index`.
+    """
+    concurrency = max(1, concurrency or batch_concurrency())
+    results = asyncio.Queue()
+    done = object()
+
+    if hasattr(records, "__aiter__"):
+        source = records.__aiter__()
+    else:
+        source = _aiter(records)
+    counter = itertools.count()
+    source_lock = asyncio.Lock()
+
+    async def next_record():
+        async with source_lock:
+            try:
+                record = await source.__anext__()
+            except StopAsyncIteration:
+                return None
+            return next(counter), record
+
+    async def worker():
+        # Bulk work yields to interactive API traffic (the lane is per task, nothing leaks out)
+        set_llm_priority("batch")
+        try:
+            while True:
+                item = await next_record()
+                if item is None:
+                    return
+                await results.put(await _generate_one(item[0], item[1], fused))
+        finally:
+            await results.put(done)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        remaining = len(workers)
+        while remaining:
+            item = await results.get()
+            if item is done:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
+async def _collect_bios(records, concurrency, fused):
+    try:
+        results = [r async for r in agenerate_bios(records, concurrency, fused)]
+    finally:
+        await get_llm_client().aclose()
+    return sorted(results, key=lambda r: r["index"])
+
+
+def generate_bios(records, concurrency: int = None, fused=None) -> list:
+    """Blocking wrapper around `agenerate_bios`; results come back in input order."""
+    return asyncio.run(_collect_bios(records, concurrency, fused))
+
+
+def _parse_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return ValueError(f"invalid JSON: {e}")
+
+
+def parse_ndjson_lines(lines):
+    """Records from NDJSON lines; a malformed line becomes a failed record instead of aborting the batch."""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield _parse_ndjson_line(line)
+
+
+async def aparse_ndjson_chunks(chunks):
+    """`parse_ndjson_lines` over an async stream of byte chunks (e.g. a request body), one line in memory at a time."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield _parse_line_bytes(line)
+    if buffer.strip():
+        yield _parse_line_bytes(buffer.strip())
+
+
+def _parse_line_bytes(line: bytes):
+    try:
+        return _parse_ndjson_line(line.decode("utf-8"))
+    except UnicodeDecodeError as e:
+        return ValueError(f"invalid UTF-8: {e}")
+
+
+def _read_ndjson(path):
+    with open(path, "r") as f:
+        yield from parse_ndjson_lines(f)
+
+
+async def _run_ndjson(input_path, output_path, concurrency, fused):
+    succeeded = failed = 0
+    try:
+        with open(output_path, "w") as out:
+            async for result in agenerate_bios(_read_ndjson(input_path), concurrency, fused):
+                out.write(json.dumps(result) + "\n")
+                if result["ok"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+    finally:
+        await get_llm_client().aclose()
+    return succeeded, failed
+
+
+def run_bio_batch(input_path="data/batch_users.ndjson", output_path="data/batch_bios.ndjson",
+                  concurrency: int = None, fused=None):
+    """NDJSON file of user records in, NDJSON file of per-record results out."""
+    print(f"\n📦 Generating bios for {input_path} (concurrency {concurrency or batch_concurrency()})...")
+    start = time.perf_counter()
+    succeeded, failed = asyncio.run(_run_ndjson(input_path, output_path, concurrency, fused))
+    elapsed = time.perf_counter() - start
+    print(f"✅ {succeeded} succeeded, ❌ {failed} failed in {elapsed:.1f}s → {output_path}")
+    return succeeded, failed
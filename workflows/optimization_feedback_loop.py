@@ -3,15 +3,24 @@ import json
 from datetime import datetime
 from agents.analytics_agent import AnalyticsAgent
 from tools.storage_helper import get_version_folder
+from tools.feedback_stream import get_feedback_aggregator
 
-def run_feedback_analysis():
+def run_feedback_analysis(live=False, platform=None, profile_version=None, window=None):
+    """
+    Score the feedback file, or with `live=True` the streaming aggregates
+    (optionally for one platform / profile version over a window such as "24h").
+    """
     print("\n🔁 Running Optimization Feedback Loop...")
-    analytics_agent = AnalyticsAgent()
+    if live:
+        analytics_agent = AnalyticsAgent(aggregator=get_feedback_aggregator(), platform=platform,
+                                         profile_version=profile_version, window=window)
+    else:
+        analytics_agent = AnalyticsAgent()
+    # One snapshot so the counts, score and suggestions all describe the same moment
     feedback = analytics_agent.feedback
-    metadata = analytics_agent.metadata
 
-    engagement_score = analytics_agent.calculate_engagement_score()
-    suggestions = analytics_agent.generate_recommendations()
+    engagement_score = analytics_agent.calculate_engagement_score(feedback)
+    suggestions = analytics_agent.generate_recommendations(feedback)
     platform = feedback.get("platform", "unknown")
     swipes = feedback.get("swipes", 0)
     matches = feedback.get("matches", 0)
@@ -5,23 +5,55 @@ from agents.bio_writer_agent import BioWriterAgent
 from agents.tone_style_agent import ToneStyleAgent
 from agents.photo_selector_agent_v3 import PhotoSelectorAgent
 from agents.platform_optimizer_agent import PlatformOptimizerAgent
+from agents.fused_bio_agent import FusedBioAgent, fused_bio_enabled
 from tools.storage_helper import get_version_folder
+from tools.llm_client import get_llm_client
+from tools.async_helpers import run_branches, timed
 import asyncio
+import time
+
+async def _generate_bio(fused: bool) -> str:
+    if fused:
+        print("⚡ Generating platform-ready bio in one call with FusedBioAgent...")
+        fused_agent = FusedBioAgent()
+        final_bio = await fused_agent.agenerate()
+        print(f"🧾 Steps: {' → '.join(fused_agent.steps)}")
+        return final_bio
 
-def run_profile_generation():
     print("🔧 Initializing BioWriterAgent...")
     bio_agent = BioWriterAgent()
 
     print("📝 Generating initial dating bio...")
-    raw_bio = bio_agent.generate_bio()
+    raw_bio = await bio_agent.agenerate_bio()
 
     print("\n🎨 Adjusting tone with ToneStyleAgent...")
     tone_agent = ToneStyleAgent()
-    adjusted_bio = tone_agent.adjust_tone_if_needed(raw_bio)
+    adjusted_bio = await tone_agent.aadjust_tone(raw_bio)
 
     print("\n📱 Optimizing bio for platform with PlatformOptimizerAgent...")
     platform_agent = PlatformOptimizerAgent()
-    final_bio = platform_agent.optimize_for_platform(adjusted_bio)
+    return await platform_agent.aoptimize(adjusted_bio)
+
+async def _select_photos():
+    print("\n📸 Running PhotoSelectorAgent...")
+    # Model loading is blocking; keep it off the loop so the bio calls start right away
+    photo_agent = await asyncio.to_thread(PhotoSelectorAgent)
+    return photo_agent, await photo_agent.select_best_images()
+
+async def _generate_profile(fused: bool):
+    # Text and vision pipelines share no data, so they run side by side; a failure cancels the other
+    try:
+        return await run_branches(timed(_generate_bio(fused)), timed(_select_photos()))
+    finally:
+        await get_llm_client().aclose()
+
+def run_profile_generation(fused=None):
+    if fused is None:
+        fused = fused_bio_enabled()
+
+    start = time.perf_counter()
+    (final_bio, bio_ms), ((photo_agent, best_images), photos_ms) = asyncio.run(_generate_profile(fused))
+    total_ms = round((time.perf_counter() - start) * 1000, 1)
 
     print("\n✨ Final Platform-Ready Bio:")
     print("--------------------------------")
@@ -31,10 +63,6 @@ def run_profile_generation():
     save_bio_version(final_bio)
     save_platform_bio_version(final_bio)
 
-    print("\n📸 Running PhotoSelectorAgent...")
-    photo_agent = PhotoSelectorAgent()
-    best_images = asyncio.run(photo_agent.select_best_images())
-
     if best_images:
         print("\n✅ Top Selected Images:")
         for img_data in best_images:
@@ -49,6 +77,8 @@ def run_profile_generation():
     else:
         print("⚠️ No suitable images found.")
 
+    print(f"\n⏱️ Bio branch: {bio_ms} ms | Photo branch: {photos_ms} ms | Total: {total_ms} ms")
+
 def save_bio_version(bio_text: str):
     version_dir = get_version_folder()
     os.makedirs(version_dir, exist_ok=True)